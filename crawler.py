@@ -12,15 +12,36 @@ Reusable async crawler module.
 
 from __future__ import annotations
 import asyncio
+import itertools
 import json
 import os
 import re
+import threading
 import time
 from dataclasses import dataclass, field, asdict
+from functools import lru_cache
 from typing import Callable, Iterable, Optional, Set, Dict, Any
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlsplit
 
 # --- optional deps (graceful degradation) ---
+try:
+    import orjson  # C encoder, much faster on markdown-heavy rows
+except Exception:
+    orjson = None  # stdlib json fallback
+
+# 64-bit URL keys for the visited/enqueued sets: ~10x smaller than keeping
+# two copies of every URL string. Collisions at 2^64 are negligible per crawl.
+try:
+    import xxhash
+
+    def _url_key(u: str) -> int:
+        return xxhash.xxh3_64_intdigest(u)
+except Exception:
+    import hashlib
+
+    def _url_key(u: str) -> int:
+        return int.from_bytes(hashlib.blake2b(u.encode("utf-8"), digest_size=8).digest(), "big")
+
 try:
     from usp.tree import sitemap_tree_for_homepage  # python-usp
 except Exception:
@@ -40,6 +61,11 @@ try:
 except Exception as e:
     raise RuntimeError("html2text is required: pip install html2text") from e
 
+try:
+    from selectolax.lexbor import LexborHTMLParser  # C-backed HTML parser
+except Exception:
+    LexborHTMLParser = None  # fall back to html2text
+
 # Hidden-links clicker (optional; only used when quick_mode=False)
 try:
     from hidden_links import get_all_links  # your module
@@ -57,6 +83,8 @@ DEFAULT_QUICK_MODE = True
 DEFAULT_ALLOWED_PREFIXES: list[str] = []  # empty => allow all
 DEFAULT_CLICK_WAIT_MS = 1000
 DEFAULT_OUTPUT_DIR = "output"
+# resource types aborted at the network layer; only HTML + link structure matters
+DEFAULT_BLOCK_RESOURCES = {"image", "font", "media", "stylesheet"}
 DEFAULT_FLUSH_ITEMS = 50        # flush after N new pages
 DEFAULT_FLUSH_SECONDS = 10.0    # and/or every T seconds
 
@@ -73,6 +101,7 @@ class CrawlerConfig:
     allowed_prefixes: list[str] = field(default_factory=lambda: list(DEFAULT_ALLOWED_PREFIXES))
     click_wait_ms: int = DEFAULT_CLICK_WAIT_MS
     output_dir: str = DEFAULT_OUTPUT_DIR
+    block_resources: Set[str] = field(default_factory=lambda: set(DEFAULT_BLOCK_RESOURCES))
     flush_every_items: int = DEFAULT_FLUSH_ITEMS
     flush_every_seconds: float = DEFAULT_FLUSH_SECONDS
 
@@ -91,22 +120,34 @@ def dbg(msg: str, verbose: bool):
     if verbose:
         print(msg, flush=True)
 
+@lru_cache(maxsize=1 << 15)
+def _parts(u: str):
+    """Memoized urlsplit: each discovered URL is otherwise parsed several
+    times (domain check, prefix check, enqueue filter)."""
+    return urlsplit(u)
+
 def same_domain(link: str, domain: str) -> bool:
+    if not link:
+        return False
     try:
-        host = urlparse(link).netloc.lower()
-        base = domain.lower().lstrip(".")
-        return host == base or host.endswith("." + base)
-    except Exception:
+        host = _parts(link).netloc.lower()
+    except ValueError:
+        return False
+    if not host:
         return False
+    base = domain.lower().lstrip(".")
+    return host == base or host.endswith("." + base)
 
 def path_allowed(url: str, allowed_prefixes: list[str]) -> bool:
     if not allowed_prefixes:
         return True
+    if not url:
+        return False
     try:
-        p = urlparse(url).path or "/"
-        return any(p.startswith(pref) for pref in allowed_prefixes)
-    except Exception:
+        p = _parts(url).path or "/"
+    except ValueError:
         return False
+    return any(p.startswith(pref) for pref in allowed_prefixes)
 
 async def wait_until_stable(page, idle_ms=400, timeout_ms=15000):
     deadline = time.time() + timeout_ms / 1000.0
@@ -138,36 +179,128 @@ async def safe_call(page, coro_factory, retries=3):
             raise
     raise last_err
 
-async def collect_static_links(page, domain: str) -> Set[str]:
-    links = await safe_call(page, lambda: page.eval_on_selector_all("a[href]", "els => els.map(e => e.href)"))
+# One fused snapshot per page: html + meta + static links + inline click URLs
+# in a single CDP round-trip instead of four (content/meta/anchors/inline).
+PAGE_SNAPSHOT_JS = """
+(domain) => {
+    const pick = (sel) => {
+        const el = document.querySelector(sel);
+        return el ? (el.getAttribute('content') ?? el.textContent ?? '').trim() : '';
+    };
+    const canon = document.querySelector('link[rel="canonical"]')?.href || '';
+    const meta = {
+        ogTitle: pick('meta[property="og:title"]') || pick('meta[name="og:title"]'),
+        ogType:  pick('meta[property="og:type"]')  || pick('meta[name="og:type"]'),
+        titleTag: (document.title || '').trim(),
+        canonical: canon
+    };
+
+    // static anchors: dedup + same-domain filter in-page so only the final
+    // in-scope set crosses the CDP boundary
+    const staticLinks = new Set();
+    document.querySelectorAll('a[href]').forEach(e => {
+        try {
+            const u = new URL(e.href);
+            if (u.protocol.startsWith('http')
+                && (u.hostname === domain || u.hostname.endsWith('.' + domain))) {
+                staticLinks.add(u.href);
+            }
+        } catch {}
+    });
+
+    // inline discovery for data-href / onclick, etc.
+    const abs = (u) => { try { return new URL(u, location.href).href } catch { return '' } };
+    const inline = new Set();
+    document.querySelectorAll('[data-href],[data-url]').forEach(el => {
+        const u = el.getAttribute('data-href') || el.getAttribute('data-url');
+        if (u) inline.add(abs(u));
+    });
+    document.querySelectorAll('[onclick]').forEach(el => {
+        const s = el.getAttribute('onclick') || '';
+        const re = /(https?:\\/\\/[^'"\\s)]+|\\/[A-Za-z0-9_\\-\\/\\.?=&%#]+)/g;
+        let m; while ((m = re.exec(s)) !== null) { const u = abs(m[1]); if (u) inline.add(u); }
+    });
+    document.querySelectorAll('[role="link"],[role="button"]').forEach(el => {
+        const u = el.getAttribute('href') || el.getAttribute('data-href') || el.getAttribute('data-url');
+        if (u) inline.add(abs(u));
+    });
+    inline.delete('');
+
     return {
-        u for u in links
-        if isinstance(u, str) and u.startswith("http") and same_domain(u, domain)
-    }
-
-async def collect_inline_click_urls(page) -> Set[str]:
-    # NOTE: mirrors your inline discovery for data-href / onclick, etc.
-    inline_candidates = await safe_call(page, lambda: page.evaluate("""
-    () => {
-        const abs = (u) => { try { return new URL(u, location.href).href } catch { return '' } };
-        const found = new Set();
-        document.querySelectorAll('[data-href],[data-url]').forEach(el => {
-            const u = el.getAttribute('data-href') || el.getAttribute('data-url');
-            if (u) found.add(abs(u));
-        });
-        document.querySelectorAll('[onclick]').forEach(el => {
-            const s = el.getAttribute('onclick') || '';
-            const re = /(https?:\\/\\/[^'"\\s)]+|\\/[A-Za-z0-9_\\-\\/\\.?=&%#]+)/g;
-            let m; while ((m = re.exec(s)) !== null) { const u = abs(m[1]); if (u) found.add(u); }
-        });
-        document.querySelectorAll('[role="link"],[role="button"]').forEach(el => {
-            const u = el.getAttribute('href') || el.getAttribute('data-href') || el.getAttribute('data-url');
-            if (u) found.add(abs(u));
-        });
-        return Array.from(found);
-    }
-    """))
-    return {u for u in inline_candidates if u}
+        html: document.documentElement.outerHTML,
+        meta,
+        staticLinks: [...staticLinks],
+        inlineClickUrls: [...inline]
+    };
+}
+"""
+
+# ---------------- html -> markdown ----------------
+
+_MD_HEADINGS = {"h1": "# ", "h2": "## ", "h3": "### ", "h4": "#### ", "h5": "##### ", "h6": "###### "}
+_MD_SKIP = {"script", "style", "noscript", "template", "head"}
+_MD_BLOCK = {"p", "div", "section", "article", "main", "header", "footer", "nav",
+             "aside", "ul", "ol", "table", "tr", "blockquote", "pre", "figure"}
+
+# html2text instances are stateful during handle(), so keep one per thread
+# (conversion runs in asyncio.to_thread) instead of allocating one per page
+_H2T_LOCAL = threading.local()
+
+def _h2t() -> "html2text.HTML2Text":
+    h = getattr(_H2T_LOCAL, "conv", None)
+    if h is None:
+        h = html2text.HTML2Text()
+        h.ignore_links = False
+        h.ignore_images = False
+        _H2T_LOCAL.conv = h
+    return h
+
+def _node_md(node) -> str:
+    """Walk a selectolax node emitting minimal markdown."""
+    parts = []
+    for child in node.iter(include_text=True):
+        tag = child.tag
+        if tag == "-text":
+            parts.append(child.text_content or "")
+        elif tag in _MD_SKIP:
+            continue
+        elif tag in _MD_HEADINGS:
+            txt = child.text(deep=True).strip()
+            if txt:
+                parts.append(f"\n\n{_MD_HEADINGS[tag]}{txt}\n\n")
+        elif tag == "a":
+            href = (child.attributes or {}).get("href") or ""
+            txt = _node_md(child).strip() or href
+            parts.append(f"[{txt}]({href})" if href else txt)
+        elif tag == "img":
+            attrs = child.attributes or {}
+            src = attrs.get("src") or ""
+            if src:
+                parts.append(f"![{attrs.get('alt') or ''}]({src})")
+        elif tag == "li":
+            parts.append("\n* " + _node_md(child).strip())
+        elif tag == "br":
+            parts.append("\n")
+        elif tag in _MD_BLOCK:
+            parts.append("\n" + _node_md(child).strip() + "\n")
+        else:
+            parts.append(_node_md(child))
+    return "".join(parts)
+
+def html_to_markdown(html: str) -> str:
+    """Convert a rendered page to markdown.
+
+    Uses selectolax (lexbor) when installed — the conversion is then a C-parsed
+    DOM walk instead of html2text's pure-Python scan — and falls back to
+    html2text otherwise.
+    """
+    if LexborHTMLParser is not None:
+        tree = LexborHTMLParser(html)
+        body = tree.body
+        if body is not None:
+            md = _node_md(body)
+            return re.sub(r"\n{3,}", "\n\n", md).strip() + "\n"
+    return _h2t().handle(html)
 
 def ensure_domain_dir(out_root: str, domain: str) -> str:
     folder = os.path.join(out_root, domain)
@@ -186,43 +319,73 @@ class ResultWriter:
         self.flush_every_items = max(1, int(flush_every_items))
         self.flush_every_seconds = float(flush_every_seconds)
         self.verbose = verbose
-        # create/append file
-        if not os.path.exists(self.ndjson_path):
-            with open(self.ndjson_path, "w", encoding="utf-8") as f:
-                pass
-
-    def add(self, item: dict):
+        # one persistent, large-buffered handle for the whole crawl instead of
+        # an open/close pair per flush (binary so orjson bytes go straight in)
+        self._nd_fh = open(self.ndjson_path, "ab", buffering=1024 * 1024)
+        # NOTE: pages.json is no longer rewritten on every flush (that was
+        # O(N^2) as the crawl grew); it is produced once by finalize_snapshot().
+        self._flush_lock = asyncio.Lock()
+
+    async def add(self, item: dict):
         self.buffer.append(item)
         if self.should_flush():
-            self.flush()
+            await self.flush_async()
+
+    async def flush_async(self):
+        # run the blocking file I/O off the event loop so workers keep scraping
+        async with self._flush_lock:
+            # Detach the buffer here on the loop thread before the thread hop:
+            # rows appended while the threaded write is in flight land in the
+            # fresh list instead of being cleared unwritten afterwards.
+            rows, self.buffer = self.buffer, []
+            if not rows:
+                return
+            await asyncio.to_thread(self._write_rows, rows)
 
     def should_flush(self) -> bool:
-        elapsed = time.time() - self.last_flush
-        return len(self.buffer) >= self.flush_every_items or elapsed >= self.flush_every_seconds
+        # size threshold only; the periodic flush is owned by Crawler._flusher
+        return len(self.buffer) >= self.flush_every_items
 
     def flush(self):
+        self._flush_sync()
+
+    def _flush_sync(self):
         if not self.buffer:
             return
-        # append to NDJSON
-        with open(self.ndjson_path, "a", encoding="utf-8") as f:
-            for row in self.buffer:
-                f.write(json.dumps(row, ensure_ascii=False) + "\n")
-        # write snapshot JSON (all data we have so far on disk)
-        # To keep it cheap, we just rewrite buffer's append portion into a rolling snapshot.
-        # If the file exists, load quickly (best-effort), append, write back.
-        try:
-            existing = []
-            if os.path.exists(self.snapshot_path):
-                with open(self.snapshot_path, "r", encoding="utf-8") as f:
-                    existing = json.load(f)
-        except Exception:
-            existing = []
-        existing.extend(self.buffer)
-        with open(self.snapshot_path, "w", encoding="utf-8") as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
-        self.buffer.clear()
+        rows, self.buffer = self.buffer, []
+        self._write_rows(rows)
+
+    def _write_rows(self, rows):
+        # append to NDJSON (deltas only; the snapshot is built once at the end)
+        if orjson is not None:
+            self._nd_fh.writelines(orjson.dumps(row) + b"\n" for row in rows)
+        else:
+            self._nd_fh.writelines(
+                json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n" for row in rows
+            )
+        self._nd_fh.flush()
         self.last_flush = time.time()
-        dbg(f"[flush] wrote snapshot + {self.ndjson_path}", self.verbose)
+        dbg(f"[flush] appended {self.ndjson_path}", self.verbose)
+
+    def close(self):
+        self._nd_fh.close()
+
+    def finalize_snapshot(self):
+        """Stream pages.ndjson into pages.json once, without loading it all."""
+        with open(self.ndjson_path, "r", encoding="utf-8") as src, \
+             open(self.snapshot_path, "w", encoding="utf-8", buffering=1 << 20) as dst:
+            dst.write("[")
+            first = True
+            for line in src:
+                line = line.strip()
+                if not line:
+                    continue
+                if not first:
+                    dst.write(",")
+                dst.write(line)
+                first = False
+            dst.write("]")
+        dbg(f"[flush] wrote snapshot {self.snapshot_path}", self.verbose)
 
 # ---------------- crawler core ----------------
 
@@ -232,8 +395,28 @@ class Crawler:
         self.log = log or (lambda m: dbg(m, self.cfg.verbose))
         self._stop = asyncio.Event()
         self.stats = CrawlStats()
-        self._visited: Set[str] = set()
-        self._enqueued: Set[str] = set()
+        # 64-bit URL digests, not the strings themselves (see _url_key)
+        self._visited: Set[int] = set()
+        self._enqueued: Set[int] = set()
+        # hard cap on simultaneously open pages (each costs tens of MB + FDs)
+        self._page_sem = asyncio.BoundedSemaphore(self.cfg.concurrency)
+        # hot-path link filters: one precompiled regex / one cached host suffix
+        # instead of re-parsing prefixes and the domain per discovered link
+        self._domain_lc = self.cfg.domain.lower().lstrip(".")
+        self._domain_suffix = "." + self._domain_lc
+        self._prefix_re = (
+            re.compile("^(?:" + "|".join(re.escape(p) for p in self.cfg.allowed_prefixes) + ")")
+            if self.cfg.allowed_prefixes else None
+        )
+
+    def _same_domain(self, url: str) -> bool:
+        host = (_parts(url).hostname or "").lower()
+        return host == self._domain_lc or host.endswith(self._domain_suffix)
+
+    def _path_allowed(self, url: str) -> bool:
+        if self._prefix_re is None:
+            return True
+        return bool(self._prefix_re.match(_parts(url).path or "/"))
 
     def request_stop(self):
         self.log("[stop] requested")
@@ -258,52 +441,69 @@ class Crawler:
         else:
             seeds.add(home)
 
-        # sitemap
-        if sitemap_tree_for_homepage:
+        return seeds
+
+    def _enqueue_seed(self, q: asyncio.Queue, u: str):
+        """Loop-thread callback: filter + enqueue one streamed sitemap URL."""
+        if self._same_domain(u) and self._path_allowed(u):
+            k = _url_key(u)
+            if k not in self._enqueued and k not in self._visited:
+                self._enqueued.add(k)
+                q.put_nowait(u)
+                self.stats.enqueued = len(self._enqueued)
+
+    async def _flusher(self, writer: ResultWriter):
+        """Periodic flush task: wakes every flush_every_seconds instead of
+        piggybacking timer checks on every writer.add call."""
+        while not self._stop.is_set():
             try:
-                tree = sitemap_tree_for_homepage(home)
-                for p in tree.all_pages():
-                    u = p.url
-                    if same_domain(u, self.cfg.domain) and path_allowed(u, self.cfg.allowed_prefixes):
-                        seeds.add(u)
-            except Exception as e:
-                self._log(f"[sitemap] skip ({e})")
-        else:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.cfg.flush_every_seconds)
+            except asyncio.TimeoutError:
+                await writer.flush_async()
+
+    async def _stream_sitemap_seeds(self, q: asyncio.Queue):
+        """Walk the sitemap in a thread, feeding URLs into the queue as found.
+
+        Avoids materializing a 100k-entry set before the first fetch; workers
+        start on the homepage while the (blocking) sitemap walk proceeds.
+        """
+        if not sitemap_tree_for_homepage:
             self._log("[sitemap] python-usp not available; continuing without sitemap seeding")
+            return
+        home = f"https://{self.cfg.domain}/"
+        loop = asyncio.get_running_loop()
 
-        return seeds
+        def _walk():
+            tree = sitemap_tree_for_homepage(home)
+            for p in tree.all_pages():
+                if self._stop.is_set():
+                    return
+                loop.call_soon_threadsafe(self._enqueue_seed, q, p.url)
+
+        try:
+            await asyncio.to_thread(_walk)
+        except Exception as e:
+            self._log(f"[sitemap] skip ({e})")
+
+    async def _scrape_one(self, page, url: str, writer: ResultWriter) -> tuple[str, Set[str]]:
+        async with self._page_sem:
+            return await self._scrape_page(page, url, writer)
 
-    async def _scrape_one(self, context, url: str, writer: ResultWriter) -> tuple[str, Set[str]]:
-        page = await context.new_page()
+    async def _scrape_page(self, page, url: str, writer: ResultWriter) -> tuple[str, Set[str]]:
         try:
             await page.goto(url, wait_until="domcontentloaded", timeout=60000)
             await wait_until_stable(page)
 
             final_url = page.url
 
-            # content -> markdown
-            html = await safe_call(page, page.content)
-            h = html2text.HTML2Text()
-            h.ignore_links = False
-            h.ignore_images = False
-            markdown = h.handle(html)
-
-            # meta
-            meta = await safe_call(page, lambda: page.evaluate("""
-                () => {
-                  const pick = (sel) => {
-                    const el = document.querySelector(sel);
-                    return el ? (el.getAttribute('content') ?? el.textContent ?? '').trim() : '';
-                  };
-                  const canon = document.querySelector('link[rel="canonical"]')?.href || '';
-                  return {
-                    ogTitle: pick('meta[property="og:title"]') || pick('meta[name="og:title"]'),
-                    ogType:  pick('meta[property="og:type"]')  || pick('meta[name="og:type"]'),
-                    titleTag: (document.title || '').trim(),
-                    canonical: canon
-                  };
-                }
-            """))
+            # one fused round-trip: html + meta + static/inline links
+            snap = await safe_call(page, lambda: page.evaluate(PAGE_SNAPSHOT_JS, self._domain_lc))
+            meta = snap["meta"]
+            static_links = snap["staticLinks"]          # already deduped in-page
+            inline_click_urls = snap["inlineClickUrls"]
+
+            # content -> markdown (off the loop; conversion is CPU-bound)
+            markdown = await asyncio.to_thread(html_to_markdown, snap["html"])
 
             parsed = urlparse(final_url)
             first_seg = (parsed.path.split("/")[1] if parsed.path and parsed.path != "/" else "") or "website"
@@ -311,20 +511,18 @@ class Crawler:
             title = (meta.get("ogTitle") or meta.get("titleTag") or "").strip()
             canonical = meta.get("canonical") or final_url
 
-            if path_allowed(final_url, self.cfg.allowed_prefixes):
+            if self._path_allowed(final_url):
                 item = {
                     "title": title,
                     "type": page_type,
                     "content": markdown,
                     "url": canonical,
                 }
-                writer.add(item)
+                await writer.add(item)
                 self.stats.saved += 1
                 self._log(f"[saved] {final_url} (title='{title[:80]}', type='{page_type}')")
 
-            # discover links
-            static_links = await collect_static_links(page, self.cfg.domain)
-            inline_click_urls = await collect_inline_click_urls(page)
+            # discover additional links via click probing (optional)
             hidden_links: Set[str] = set()
             if not self.cfg.quick_mode and get_all_links:
                 try:
@@ -334,26 +532,24 @@ class Crawler:
                         click_wait_ms=200,
                         same_domain_only=True,
                         headless=self.cfg.headless,
-                        scroll_steps=12
+                        scroll_steps=12,
+                        context=page.context,  # reuse our browser; no per-URL launch
                     )
                 except Exception as e:
                     self._log(f"[hidden_links] error: {e}")
 
-            all_found = static_links.union(inline_click_urls).union(hidden_links)
-            filtered = {
-                u for u in all_found
-                if isinstance(u, str) and u.startswith("http")
-                and same_domain(u, self.cfg.domain)
-                and path_allowed(u, self.cfg.allowed_prefixes)
-            }
+            # stream-filter straight into one set; no intermediate unions
+            filtered: Set[str] = set()
+            for u in itertools.chain(static_links, inline_click_urls, hidden_links):
+                if isinstance(u, str) and u.startswith("http") \
+                        and self._same_domain(u) and self._path_allowed(u):
+                    filtered.add(u)
             self._log(f"[links] static={len(static_links)} inline={len(inline_click_urls)} hidden={len(hidden_links)} on {final_url}")
             return final_url, filtered
 
         except Exception as e:
             self._log(f"[error] {url} -> {e}")
             return url, set()
-        finally:
-            await page.close()
 
     async def run(self) -> CrawlStats:
         seeds = await self._seed_urls()
@@ -368,9 +564,9 @@ class Crawler:
 
         for u in seeds:
             # homepage always allowed; otherwise respect prefixes
-            if same_domain(u, self.cfg.domain) and (path_allowed(u, self.cfg.allowed_prefixes) or urlparse(u).path in ("", "/")):
+            if self._same_domain(u) and (self._path_allowed(u) or urlparse(u).path in ("", "/")):
                 q.put_nowait(u)
-                self._enqueued.add(u)
+                self._enqueued.add(_url_key(u))
         self.stats.enqueued = len(self._enqueued)
         self._log(f"[seed] {self.stats.enqueued} URLs")
 
@@ -380,32 +576,54 @@ class Crawler:
                 user_agent="Mozilla/5.0 (compatible; MyCrawler/1.0; +https://example.com/bot)"
             )
 
-            async def worker(wid: int):
-                while not self._stop.is_set():
-                    try:
-                        url = await asyncio.wait_for(q.get(), timeout=1.0)
-                    except asyncio.TimeoutError:
-                        if q.empty():
-                            return
-                        continue
+            if self.cfg.block_resources:
+                blocked = set(self.cfg.block_resources)
 
-                    if self._stop.is_set():
+                async def _route(route):
+                    if route.request.resource_type in blocked:
+                        await route.abort()
+                    else:
+                        await route.continue_()
+
+                await context.route("**/*", _route)
+
+            # fixed pool of long-lived pages; page setup/teardown per URL is
+            # one of Playwright's heaviest operations
+            pages_q: asyncio.Queue = asyncio.Queue()
+            for _ in range(self.cfg.concurrency):
+                pages_q.put_nowait(await context.new_page())
+
+            async def worker(wid: int):
+                while True:
+                    # Block until work arrives: the sitemap streamer can go
+                    # quiet for seconds between child sitemaps, so an idle
+                    # timeout here would strand later seeds with no consumer.
+                    # run() wakes us with a None sentinel when the queue has
+                    # truly drained.
+                    url = await q.get()
+                    if url is None:
                         q.task_done()
                         return
 
-                    if len(self._visited) >= self.cfg.limit:
+                    if self._stop.is_set() or len(self._visited) >= self.cfg.limit:
+                        # keep draining so q.join() can complete
                         q.task_done()
-                        return
+                        continue
 
-                    if url in self._visited:
+                    url_k = _url_key(url)
+                    if url_k in self._visited:
                         q.task_done()
                         continue
 
-                    self._visited.add(url)
+                    self._visited.add(url_k)
                     self.stats.visited = len(self._visited)
                     self._log(f"[worker {wid}] visiting: {url}")
 
-                    _, links = await self._scrape_one(context, url, writer)
+                    page = await pages_q.get()
+                    try:
+                        _, links = await self._scrape_one(page, url, writer)
+                    finally:
+                        pages_q.put_nowait(page)
 
                     # Batch enqueue under lock (single-threaded here)
                     to_add = []
@@ -413,8 +631,9 @@ class Crawler:
                         for lnk in links:
                             if len(self._visited) >= self.cfg.limit:
                                 break
-                            if lnk not in self._visited and lnk not in self._enqueued and path_allowed(lnk, self.cfg.allowed_prefixes):
-                                self._enqueued.add(lnk)
+                            lnk_k = _url_key(lnk)
+                            if lnk_k not in self._visited and lnk_k not in self._enqueued and self._path_allowed(lnk):
+                                self._enqueued.add(lnk_k)
                                 to_add.append(lnk)
 
                     for lnk in to_add:
@@ -425,16 +644,28 @@ class Crawler:
                         self._log(f"[worker {wid}] enqueued {len(to_add)} new links")
                     q.task_done()
 
+            # stream sitemap seeds concurrently with the first page fetches
+            sitemap_task = asyncio.create_task(self._stream_sitemap_seeds(q))
+            flusher = asyncio.create_task(self._flusher(writer))
             workers = [asyncio.create_task(worker(i)) for i in range(self.cfg.concurrency)]
+            await sitemap_task
             await q.join()
-            for w in workers:
-                w.cancel()
-            await asyncio.gather(*workers, return_exceptions=True)
+            # one sentinel per worker; cancelling instead could interrupt a
+            # worker mid-scrape
+            for _ in workers:
+                q.put_nowait(None)
+            await asyncio.gather(*workers)
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            while not pages_q.empty():
+                await pages_q.get_nowait().close()
             await context.close()
             await browser.close()
 
-        # final flush
+        # final flush + one-shot snapshot
         writer.flush()
+        writer.close()
+        writer.finalize_snapshot()
         self.stats.finished_at = time.time()
         return self.stats
 
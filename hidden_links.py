@@ -1,57 +1,125 @@
 # extract_all_links.py
 import asyncio
+import functools
 import re
+import sys
 from urllib.parse import urlsplit, urlunsplit, urljoin
 
 from playwright.async_api import async_playwright, TimeoutError as PWTimeout
 
+try:
+    import uvloop  # drop-in libuv event loop; queue/CDP-heavy awaits speed up
+except Exception:
+    uvloop = None
+
 # --------- timeouts (tweak as needed) ---------
 DEFAULT_NAV_TIMEOUT_MS = 15_000   # for page.goto / navigations
 DEFAULT_CTX_TIMEOUT_MS = 10_000   # for selectors, clicks, etc.
 
+# stop click-probing after this many consecutive probes found nothing new
+STALE_PROBE_LIMIT = 20
+
 # ------------- utils -------------
+# Link filtering re-splits the same strings constantly (normalize_url,
+# same_domain, in_base_path, has_hostname chain on every candidate), so both
+# the split and the full normalization are memoized.
+_split = functools.lru_cache(maxsize=16384)(urlsplit)
+
+@functools.lru_cache(maxsize=16384)
 def normalize_url(base: str, u: str) -> str:
     try:
         absu = urljoin(base, u)
-        parts = urlsplit(absu)
-        # drop fragment, keep query
-        parts = parts._replace(fragment="")
-        # normalize path (remove duplicate slashes)
-        path = re.sub(r"/{2,}", "/", parts.path) or "/"
-        parts = parts._replace(path=path)
-        return urlunsplit(parts)
-    except Exception:
+        parts = _split(absu)
+    except ValueError:
         return u
+    # normalize path (remove duplicate slashes) without the regex engine
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    # drop fragment, keep query
+    return urlunsplit((parts.scheme, parts.netloc, path, parts.query, ""))
 
 def same_domain(a: str, b: str) -> bool:
+    if not a or not b:
+        return False
     try:
-        ha = urlsplit(a).hostname or ""
-        hb = urlsplit(b).hostname or ""
-        ha = ha.lower().lstrip(".")
-        hb = hb.lower().lstrip(".")
-        return ha == hb or ha.endswith("." + hb) or hb.endswith("." + ha)
-    except Exception:
+        ha = (_split(a).hostname or "").lower().lstrip(".")
+        hb = (_split(b).hostname or "").lower().lstrip(".")
+    except ValueError:
         return False
+    if not ha or not hb:
+        return False
+    return ha == hb or ha.endswith("." + hb) or hb.endswith("." + ha)
+
+def make_same_domain(base: str):
+    """Specialize same_domain for a fixed base URL: the base host is parsed
+    and lowered once, so each check splits only the candidate."""
+    try:
+        bh = (_split(base).hostname or "").lower().lstrip(".")
+    except ValueError:
+        bh = ""
+    # literal scheme://host prefixes cover the overwhelmingly common case
+    # with two C-level startswith calls, no urlsplit at all
+    fast = ("https://" + bh, "http://" + bh)
+
+    def _check(u: str) -> bool:
+        if not bh or not u:
+            return False
+        for pref in fast:
+            if u.startswith(pref):
+                n = len(pref)
+                if len(u) == n or u[n] in "/?#":
+                    return True
+                break  # same scheme, longer host: fall through to full parse
+        try:
+            h = (_split(u).hostname or "").lower().lstrip(".")
+        except ValueError:
+            return False
+        return h == bh or h.endswith("." + bh) or bh.endswith("." + h)
+
+    return _check
+
+def make_in_base_path(base_url: str):
+    """Specialize in_base_path for a fixed base: the base path and its '/'
+    prefix are computed once; root-scoped bases collapse to a constant."""
+    try:
+        base_path = _split(base_url).path or "/"
+    except ValueError:
+        base_path = "/"
+    if base_path == "/":
+        return lambda u: True  # no path restriction at root
+    prefix = base_path if base_path.endswith("/") else base_path + "/"
+
+    def _check(u: str) -> bool:
+        try:
+            upath = _split(u).path or "/"
+        except ValueError:
+            return False
+        return upath == base_path or upath.startswith(prefix)
+
+    return _check
 
 def has_hostname(u: str) -> bool:
+    if not u:
+        return False
     try:
-        return bool(urlsplit(u).hostname)
-    except Exception:
+        return bool(_split(u).hostname)
+    except ValueError:
         return False
 
 def in_base_path(base_url: str, u: str) -> bool:
     """Keep only URLs whose path is within the base_url's path (e.g., base='/blog' -> '/blog', '/blog/', '/blog/*')."""
     try:
-        base_path = urlsplit(base_url).path or "/"
+        base_path = _split(base_url).path or "/"
         if base_path == "/":
             return True  # no path restriction at root
-        upath = urlsplit(u).path or "/"
-        if upath == base_path:
-            return True
-        prefix = base_path if base_path.endswith("/") else base_path + "/"
-        return upath.startswith(prefix)
-    except Exception:
+        upath = _split(u).path or "/"
+    except ValueError:
         return False
+    if upath == base_path:
+        return True
+    prefix = base_path if base_path.endswith("/") else base_path + "/"
+    return upath.startswith(prefix)
 
 # ------------- JS hooks -------------
 HOOK_HISTORY_JS = r"""
@@ -96,22 +164,37 @@ HOOK_HISTORY_JS = r"""
 })();
 """
 
-CSSPATH_JS = r"""
-(el => {
-  if (!(el instanceof Element)) return null;
-  const esc = CSS && CSS.escape ? CSS.escape : (s => (s+'').replace(/([ #;?%&,.+*~\':"!^$[\]()=>|\/@])/g,'\\$1'));
-  const parts = [];
-  while (el && el.nodeType === 1 && parts.length < 20) {
-    let selector = el.nodeName.toLowerCase();
-    if (el.id) { selector += '#' + esc(el.id); parts.unshift(selector); break; }
-    let sib = el, nth = 1;
-    while (sib = sib.previousElementSibling) { if (sib.nodeName.toLowerCase() === selector) nth++; }
-    selector += `:nth-of-type(${nth})`;
-    parts.unshift(selector);
-    el = el.parentElement;
+# Walks clickables once, splits off statically-readable URLs, and tags each
+# residual JS-only element with data-cp-id so later lookups are a trivial
+# attribute selector instead of a deep CSS path. The walk is deterministic
+# for a given DOM, so re-running it after a reload/go_back (or on a second
+# probe page showing the same URL) reproduces the same ids.
+CANDIDATE_TAG_JS = r"""
+(limit) => {
+  const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+  const looksClickable = el => {
+    const s = getComputedStyle(el);
+    return s.cursor === 'pointer' || el.tagName === 'BUTTON' || el.getAttribute('role') === 'link' || el.hasAttribute('onclick');
+  };
+  const urlRe = /['"](https?:\/\/[^'"\s]+|\/[A-Za-z0-9_\-\/\.?=&%#]+)['"]/g;
+  const staticUrls = new Set();
+  const jsOnlyIds = [];
+  const nodes = Array.from(document.querySelectorAll("a[href], [role='link'], button, [onclick], [data-href], [data-url], [data-link]"));
+  for (const el of nodes) {
+    if (!visible(el) || !looksClickable(el)) continue;
+    const direct = el.getAttribute('href') || el.getAttribute('data-href') || el.getAttribute('data-url') || el.getAttribute('data-link');
+    if (direct && direct !== '#' && !direct.startsWith('javascript:')) { staticUrls.add(direct); continue; }
+    const onclick = el.getAttribute('onclick') || '';
+    let m, literal = false;
+    while ((m = urlRe.exec(onclick)) !== null) { staticUrls.add(m[1]); literal = true; }
+    if (literal) continue;
+    const id = jsOnlyIds.length;
+    el.setAttribute('data-cp-id', String(id));
+    jsOnlyIds.push(id);
+    if (jsOnlyIds.length >= limit) break;
   }
-  return parts.join(' > ');
-})
+  return {staticUrls: Array.from(staticUrls), jsOnlyIds};
+}
 """
 
 # ------------- navigation helper -------------
@@ -135,48 +218,53 @@ async def smart_goto(page, url: str, timeout_ms: int = DEFAULT_NAV_TIMEOUT_MS):
             pass
 
 # ------------- core extraction -------------
-async def auto_scroll(page, max_steps=20, wait_ms=600):
-    last_h = 0
-    for _ in range(max_steps):
-        h = await page.evaluate("document.body.scrollHeight")
-        if h <= last_h:
-            break
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await page.wait_for_timeout(wait_ms)
-        last_h = h
+async def auto_scroll(page, max_steps=20, wait_ms=150):
+    """Scroll to the bottom until the DOM stops mutating.
 
-async def candidate_click_paths(page, limit=150):
-    js = f"""
-(() => {{
-  const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
-  const looksClickable = el => {{
-    const s = getComputedStyle(el);
-    return s.cursor === 'pointer' || el.tagName === 'BUTTON' || el.getAttribute('role') === 'link' || el.hasAttribute('onclick');
-  }};
-  const set = new Set();
-  const nodes = Array.from(document.querySelectorAll("a[href], [role='link'], button, [onclick], [data-href], [data-url], [data-link]"));
-  const pruned = nodes.filter(el => visible(el) && looksClickable(el));
-  const paths = [];
-  for (const el of pruned) {{
-    try {{
-      const p = ({CSSPATH_JS})(el);
-      if (p && !set.has(p)) {{ set.add(p); paths.push(p); }}
-      if (paths.length >= {limit}) break;
-    }} catch (_) {{}}
-  }}
-  return paths;
-}})()
-"""
-    return await page.evaluate(js)
+    Runs entirely in one evaluate: a MutationObserver tracks layout changes
+    while we scroll, and we bail out as soon as the page has been quiet for
+    `wait_ms` — static pages cost one short wait instead of max_steps rounds
+    of scrollHeight polling over CDP.
+    """
+    max_ms = max_steps * wait_ms
+    try:
+        await page.evaluate("""async ([maxMs, quietMs]) => {
+            let last = performance.now();
+            const obs = new MutationObserver(() => last = performance.now());
+            obs.observe(document.body, {childList: true, subtree: true});
+            const start = performance.now();
+            while (performance.now() - start < maxMs) {
+                window.scrollTo(0, document.body.scrollHeight);
+                await new Promise(r => setTimeout(r, 100));
+                if (performance.now() - last > quietMs) break;
+            }
+            obs.disconnect();
+        }""", [max_ms, wait_ms])
+    except Exception:
+        pass  # page may navigate mid-scroll; links get picked up anyway
 
-async def click_probe(page, path, base_url, wait_ms, same_domain_only):
-    """Click one element and capture resulting URL(s). Returns (set_of_urls, navigated_bool)."""
+async def collect_link_candidates(page, limit=150):
+    """One DOM walk that splits clickables into URLs we can read directly
+    (href / data-* / URL literals inside onclick) and the residual "JS-only"
+    elements that genuinely need a click probe. Most candidates fall in the
+    first bucket, so this trades O(N) click+go_back navigations for one
+    evaluate.
+
+    Returns ``{"staticUrls": [...], "jsOnlyIds": [...]}`` where each id maps
+    to an element now carrying a matching ``data-cp-id`` attribute.
+    """
+    return await page.evaluate(CANDIDATE_TAG_JS, limit)
+
+async def click_probe(page, cp_id, base_url, wait_ms, domain_check=None):
+    """Click one tagged element and capture resulting URL(s). Returns (set_of_urls, navigated_bool)."""
     out = set()
     navigated = False
 
     start_url = page.url
     try:
-        el = await page.query_selector(path)
+        # attribute selectors are far cheaper for Playwright's engine than
+        # the deep nth-of-type paths we used to build
+        el = await page.query_selector(f'[data-cp-id="{cp_id}"]')
         if not el:
             return out, navigated
 
@@ -190,7 +278,7 @@ async def click_probe(page, path, base_url, wait_ms, same_domain_only):
             try:
                 await page.evaluate(
                     "(sel) => { const el = document.querySelector(sel); if (el) el.dispatchEvent(new MouseEvent('click', {bubbles:true,cancelable:true})); }",
-                    path
+                    f'[data-cp-id="{cp_id}"]'
                 )
             except Exception:
                 return out, navigated
@@ -220,8 +308,8 @@ async def click_probe(page, path, base_url, wait_ms, same_domain_only):
                 pass
 
     # enforce same-domain (if requested) and path-scope
-    if same_domain_only:
-        out = {u for u in out if same_domain(u, base_url)}
+    if domain_check is not None:
+        out = {u for u in out if domain_check(u)}
     out = {u for u in out if in_base_path(base_url, u)}
     return out, navigated
 
@@ -231,59 +319,128 @@ async def get_all_links(
     click_wait_ms: int = 1000,
     same_domain_only: bool = True,
     headless: bool = True,
-    scroll_steps: int = 10
+    scroll_steps: int = 10,
+    probe_concurrency: int = 4,
+    context=None
 ):
+    """Discover click-only/SPA links on `url`.
+
+    When `context` (a Playwright BrowserContext) is given, probe pages are
+    opened on it instead of launching a whole new Chromium — browser startup
+    is ~0.5-1 s of pure overhead per call otherwise. Callers without a live
+    browser (e.g. the CLI entry below) can keep omitting it.
+    """
     results = set()
+    # base host/path parsed once for the whole call instead of per candidate
+    sd = make_same_domain(url) if same_domain_only else None
+    ibp = make_in_base_path(url)
+
+    # record navigations initiated by clicks (hard or SPA)
+    def add_url(u: str):
+        if not u:
+            return
+        u = normalize_url(url, u)
+        if (sd is None or sd(u)) and ibp(u) and u not in results:
+            results.add(u)
+            print(f"Adding New URL: {u}")
+
+    async def probe_on(context):
+        pages = []
+
+        async def on_popup(p2):
+            # p2.url is normally set at open time: read it and close without
+            # waiting for the popup to load (that wait serialized probes)
+            u = p2.url
+            if not u or u == "about:blank":
+                try:
+                    await asyncio.wait_for(p2.wait_for_event("framenavigated"), timeout=0.5)
+                    u = p2.url
+                except Exception:
+                    pass
+            add_url(u)
+            try:
+                await p2.close()
+            except Exception:
+                pass
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context()
-        # Set sensible defaults globally
-        context.set_default_navigation_timeout(DEFAULT_NAV_TIMEOUT_MS)
-        context.set_default_timeout(DEFAULT_CTX_TIMEOUT_MS)
-
-        page = await context.new_page()
-
-        # record navigations initiated by clicks (hard or SPA)
-        def add_url(u: str):
-            if not u:
-                return
-            u = normalize_url(url, u)
-            if (not same_domain_only or same_domain(u, url)) and in_base_path(url, u) and u not in results:
-                results.add(u)
-                print(f"Adding New URL: {u}")
-
-        page.on("request", lambda req: (req.is_navigation_request() and add_url(req.url)))
-        # page.on("framenavigated", lambda fr: add_url(fr.url))  # optional
-
-        # Go & hook SPA nav
-        await page.add_init_script(HOOK_HISTORY_JS)
-        await smart_goto(page, url, timeout_ms=DEFAULT_NAV_TIMEOUT_MS)
-
-        # Auto-scroll to reveal lazy content so clickable elements mount
-        await auto_scroll(page, max_steps=scroll_steps)
-
-        # Prepare click candidates and probe
-        paths = await candidate_click_paths(page, limit=max_clicks * 2)
-
-        clicks_done = 0
-        seen_paths = set()
-        for path in paths:
-            if clicks_done >= max_clicks:
-                break
-            if path in seen_paths:
-                continue
-            seen_paths.add(path)
-            urls_found, _ = await click_probe(page, path, url, click_wait_ms, same_domain_only)
-            urls_found = {u for u in urls_found if in_base_path(url, u)}
-            results |= urls_found
-            clicks_done += 1
-            await page.wait_for_timeout(1500)
-
-        await browser.close()
+        async def new_probe_page():
+            pg = await context.new_page()
+            pages.append(pg)
+            pg.on("request", lambda req: (req.is_navigation_request() and add_url(req.url)))
+            pg.on("popup", on_popup)
+            # Go & hook SPA nav
+            await pg.add_init_script(HOOK_HISTORY_JS)
+            await smart_goto(pg, url, timeout_ms=DEFAULT_NAV_TIMEOUT_MS)
+            # Auto-scroll to reveal lazy content so clickable elements mount
+            await auto_scroll(pg, max_steps=scroll_steps)
+            return pg
+
+        try:
+            page = await new_probe_page()
+
+            # Static URLs come straight from the DOM walk; only the residual
+            # JS-only elements are worth a click probe.
+            tag_limit = max_clicks * 2
+            cand = await collect_link_candidates(page, limit=tag_limit)
+            for u in cand.get("staticUrls") or []:
+                add_url(u)
+            ids = (cand.get("jsOnlyIds") or [])[:max_clicks]
+
+            async def retag(probe_page):
+                # re-run the deterministic walk so data-cp-id tags exist on
+                # this page's (fresh) DOM
+                try:
+                    await probe_page.evaluate(CANDIDATE_TAG_JS, tag_limit)
+                except Exception:
+                    pass
+
+            # adaptive budget: once STALE_PROBE_LIMIT consecutive probes
+            # (counted across shards) add nothing, the remaining candidates
+            # are almost certainly decorative — stop paying for them
+            stale = 0
+
+            async def probe_shard(probe_page, shard):
+                nonlocal stale
+                if probe_page is not page:
+                    await retag(probe_page)
+                for cp_id in shard:
+                    if stale >= STALE_PROBE_LIMIT:
+                        return
+                    before = len(results)
+                    urls_found, navigated = await click_probe(probe_page, cp_id, url, click_wait_ms, sd)
+                    results.update(u for u in urls_found if ibp(u))
+                    stale = 0 if len(results) > before else stale + 1
+                    if navigated:  # go_back reloaded the DOM; tags are gone
+                        await retag(probe_page)
+                    await probe_page.wait_for_timeout(1500)
+
+            # Fan independent probes out over a few pages; navigating clicks
+            # go_back on their own page, so shards stay isolated.
+            n_pages = max(1, min(probe_concurrency, len(ids)))
+            pages_pool = [page] + [await new_probe_page() for _ in range(n_pages - 1)]
+            shards = [ids[i::n_pages] for i in range(n_pages)]
+            await asyncio.gather(*[probe_shard(pg, shard) for pg, shard in zip(pages_pool, shards)])
+        finally:
+            for pg in pages:
+                try:
+                    await pg.close()
+                except Exception:
+                    pass
+
+    if context is not None:
+        await probe_on(context)
+    else:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless)
+            own_context = await browser.new_context()
+            # Set sensible defaults globally
+            own_context.set_default_navigation_timeout(DEFAULT_NAV_TIMEOUT_MS)
+            own_context.set_default_timeout(DEFAULT_CTX_TIMEOUT_MS)
+            await probe_on(own_context)
+            await browser.close()
 
     # keep only URLs that actually have a domain/hostname and are in-base-path
-    results = {u for u in results if has_hostname(u) and in_base_path(url, u)}
+    results = {u for u in results if has_hostname(u) and ibp(u)}
     return sorted(results)
 
 # ------------- "main" with in-code params (no CLI) -------------
@@ -305,8 +462,12 @@ async def _amain():
         headless=headless,
         scroll_steps=scroll_steps,
     )
-    for u in links:
-        print(u)
+    # one write syscall for the whole (already sorted) result set
+    if links:
+        sys.stdout.write("\n".join(links))
+        sys.stdout.write("\n")
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(_amain())
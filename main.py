@@ -1,14 +1,110 @@
 # async_site_crawler.py
 import asyncio
+import hashlib
 import json
+import multiprocessing
+import os
 import re
-from urllib.parse import urlparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
 
 from playwright.async_api import async_playwright, TimeoutError as PWTimeout
 from usp.tree import sitemap_tree_for_homepage
-import html2text
+import requests
 import pdb
 
+try:
+    from lxml import etree  # C-backed streaming XML for sitemap parsing
+    from lxml import html as lxml_html  # C-backed anchor extraction
+except Exception:
+    etree = None
+    lxml_html = None
+
+try:
+    import orjson  # C JSON encoder; big content records serialize ~5x faster
+except Exception:
+    orjson = None
+
+try:
+    import uvloop  # libuv event loop; asyncio-heavy loops run 2-4x faster
+except Exception:
+    uvloop = None
+
+try:
+    from rbloom import Bloom  # ~1.2 MB per million URLs vs ~200 B/URL in a set
+except Exception:
+    Bloom = None
+
+
+def canonical_url(u: str) -> str:
+    """Normalize a URL for dedup: lowercase scheme/host, drop the fragment,
+    sort query params, collapse the trailing slash. Kills the near-duplicate
+    URL explosions (a/, a, a?b=1&c=2 vs a?c=2&b=1) that bloat the frontier."""
+    try:
+        parts = urlsplit(u)
+    except ValueError:
+        return u
+    path = parts.path or "/"
+    if path != "/" and path.endswith("/"):
+        path = path[:-1]
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+def _shard_of(u: str, shards: int) -> int:
+    # stable across processes (built-in hash() is salted per interpreter)
+    digest = hashlib.blake2b(u.encode("utf-8", "ignore"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+class SeenUrls:
+    """Membership structure for the visited/enqueued frontiers.
+
+    With rbloom installed this is a Bloom filter plus a bounded exact sidecar
+    of the most recent entries (recent URLs are the likeliest re-encounters,
+    and the sidecar answers for them exactly); without it, a plain set, so
+    behaviour degrades gracefully rather than importing a hard dependency.
+
+    Exact structures store 16-byte blake2b digests rather than the URL
+    strings themselves: fixed ~49 B per entry regardless of URL length and a
+    single 128-bit compare per hash probe, instead of ~50 B overhead plus
+    the UTF-8 payload of ever-longer query-string URLs.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, fpr: float = 0.001, exact: int = 10_000):
+        self._bloom = Bloom(capacity, fpr) if Bloom is not None else None
+        self._exact = set() if self._bloom is None else OrderedDict()
+        self._exact_cap = exact
+
+    @staticmethod
+    def _key(u: str) -> bytes:
+        return hashlib.blake2b(u.encode("utf-8", "ignore"), digest_size=16).digest()
+
+    def __contains__(self, u: str) -> bool:
+        k = self._key(u)
+        if self._bloom is None:
+            return k in self._exact
+        return k in self._exact or k in self._bloom
+
+    def add(self, u: str):
+        k = self._key(u)
+        if self._bloom is None:
+            self._exact.add(k)
+            return
+        self._bloom.add(k)
+        self._exact[k] = None
+        if len(self._exact) > self._exact_cap:
+            self._exact.popitem(last=False)
+
+
+def _json_bytes(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+from crawler import PAGE_SNAPSHOT_JS, html_to_markdown
 from hidden_links import get_all_links
 import time
 from playwright.async_api import Error as PWError
@@ -29,11 +125,50 @@ ALLOWED_PATH_PREFIXES = []
 MAX_CLICK_PROBES_PER_PAGE = 30
 CLICK_WAIT_MS = 1000  # wait up to N ms for a navigation after clicking
 
+# Hidden-link (click-probe) discovery is by far the most expensive step:
+# only run it on pages where static+inline extraction found almost nothing,
+# and never more than a few probes at once across the whole crawl
+HIDDEN_MIN_LINKS = 5
+HIDDEN_PROBE_SEM = asyncio.Semaphore(4)
+
+# Resource types we never parse — abort them at the network layer
+BLOCK_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+
+# Recycle a BrowserContext after it has served this many pages: long-lived
+# contexts with route handlers + init scripts attached leak memory, so
+# rotation keeps RSS bounded on large crawls
+CONTEXT_ROTATE_PAGES = 50
+
 # Output
 OUTPUT_JSON = "crawl_output.json"
-
-# ---------- global data object (protected with a lock) ----------
-RESULTS = []  # items: {"title": str, "type": str, "content": str, "url": str}
+OUTPUT_JSONL = "crawl_output.jsonl"  # streamed during the crawl
+
+# >1 spawns that many crawler processes, each owning the slice of the URL
+# space where blake2b(canonical_url) % SHARDS matches its index. Sidesteps
+# the GIL for the conversion-heavy part of the crawl; every shard streams
+# the sitemap itself and visits the homepage, so seeds reach all of them.
+SHARDS = 1
+
+# blake2b digests of page HTML already converted; listing/pagination templates
+# mounted at several URLs skip the (expensive) markdown pass entirely
+SEEN_CONTENT_HASHES: set[bytes] = set()
+
+# canonical URLs already written to the JSONL — cheap O(1) dedup at write
+# time so the final collation pass has less duplicate work to discard
+WRITTEN_URLS: set[str] = set()
+
+# Per-origin politeness cap, layered under the worker pool: a large
+# CONCURRENCY otherwise means that many simultaneous hits on one host
+# (rate limits, TCP resets), while workers doing Python-side work
+# shouldn't be throttled at all.
+HOST_MAX_CONCURRENCY = 8
+_HOST_SEMAPHORES: dict[str, asyncio.Semaphore] = {}
+
+def sem_for(host: str) -> asyncio.Semaphore:
+    sem = _HOST_SEMAPHORES.get(host)
+    if sem is None:
+        sem = _HOST_SEMAPHORES[host] = asyncio.Semaphore(HOST_MAX_CONCURRENCY)
+    return sem
 
 # ---------- in-page nav hook (installed before page scripts run) ----------
 NAV_INJECT_JS = r"""
@@ -85,6 +220,22 @@ NAV_INJECT_JS = r"""
     const a = e.target?.closest?.('a[href]');
     if (a && a.getAttribute('href')) record('anchor.click', a.href);
   }, true);
+
+  // Pre-installed meta extractor: callers evaluate window.__extractMeta()
+  // so V8 doesn't re-parse the same picker script on every page
+  window.__extractMeta = () => {
+    const pick = (sel) => {
+      const el = document.querySelector(sel);
+      return el ? (el.getAttribute('content') ?? el.textContent ?? '').trim() : '';
+    };
+    const canon = document.querySelector('link[rel="canonical"]')?.href || '';
+    return {
+      ogTitle: pick('meta[property="og:title"]') || pick('meta[name="og:title"]'),
+      ogType:  pick('meta[property="og:type"]')  || pick('meta[name="og:type"]'),
+      titleTag: (document.title || '').trim(),
+      canonical: canon
+    };
+  };
 })();
 """
 
@@ -97,24 +248,29 @@ NAV_DESTROYED_SIGNS = (
 )
 
 async def wait_until_stable(page, idle_ms=400, timeout_ms=15000):
-    """Wait until the URL stops changing and the page is idle for a short period."""
-    deadline = time.time() + timeout_ms / 1000.0
-    last_url = page.url
-    while time.time() < deadline:
-        # wait for DOM to be ready/idle
-        try:
-            await page.wait_for_load_state("networkidle", timeout=timeout_ms)
-        except PWTimeout:
-            # some sites never hit 'networkidle'; fall back to domcontentloaded
+    """Wait until no navigation has fired for `idle_ms` (event-driven).
+
+    Subscribes to 'framenavigated' instead of polling page.url on a sleep
+    loop: stable pages return after one idle window and SPA redirects reset
+    the window as they happen. Deliberately avoids 'networkidle', which
+    stalls for seconds on pages with analytics beacons/long-poll connections.
+    """
+    ev = asyncio.Event()
+
+    def _on_nav(_):
+        ev.set()
+
+    page.on("framenavigated", _on_nav)
+    try:
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        while time.monotonic() < deadline:
+            ev.clear()
             try:
-                await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
-            except PWTimeout:
-                pass
-        await asyncio.sleep(idle_ms / 1000.0)
-        if page.url == last_url:
-            return
-        last_url = page.url
-    # give up: return anyway
+                await asyncio.wait_for(ev.wait(), timeout=idle_ms / 1000.0)
+            except asyncio.TimeoutError:
+                return  # quiet for a full idle window -> stable
+    finally:
+        page.remove_listener("framenavigated", _on_nav)
 
 async def safe_call(page, coro_factory, retries=3):
     """Run a page operation with retries if a navigation destroys the context."""
@@ -138,100 +294,115 @@ def dbg(msg: str):
     if VERBOSE:
         print(msg, flush=True)
 
+# hoisted out of the per-page hot path: one regex for the whole run instead
+# of a fresh compile per call
+_FN_RE = re.compile(r"[^a-zA-Z0-9]")
+
+# Markdown conversion is the one CPU-heavy step per page; a process pool
+# runs it on other cores while the event loop keeps driving Playwright.
+# Workers spawn lazily on first submit, so idle runs cost nothing.
+CONVERTER_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+def _anchors_from_html(html: str, base_url: str, domain: str) -> set[str]:
+    """Extract same-domain anchors from already-fetched HTML with lxml.
+
+    The snapshot evaluate serialized the DOM anyway, so pulling hrefs out of
+    it in-process (C parser, no JS marshaling) is cheaper than shipping the
+    anchor list over CDP as well.
+    """
+    out = set()
+    doc = lxml_html.fromstring(html)
+    for h in doc.xpath("//a/@href"):
+        u = urljoin(base_url, h)
+        if u.startswith("http") and same_domain(u, domain):
+            out.add(u)
+    return out
+
 def to_filename(url: str) -> str:
-    safe = re.sub(r"[^a-zA-Z0-9]", "_", url)
+    safe = _FN_RE.sub("_", url)
     return (safe[:150] or "page") + ".md"
 
+# the same URL gets parsed at seed, enqueue and save time — cache the split
+_uparse = lru_cache(maxsize=16384)(urlparse)
+
+@lru_cache(maxsize=32)
+def _allowed_prefix_re(prefixes: tuple[str, ...]):
+    """Compile a prefix tuple into one anchored alternation: a single C-level
+    match replaces the per-URL Python loop over prefixes."""
+    if not prefixes:
+        return None
+    return re.compile("^(?:" + "|".join(re.escape(p) for p in prefixes) + ")")
+
 def same_domain(link: str, domain: str) -> bool:
+    # hand-rolled host slice: called once per anchor, and find/slice are a
+    # handful of C ops where urlparse runs a full regex-based parse
     try:
-        host = urlparse(link).netloc.lower()
+        i = link.find("://")
+        if i < 0:
+            return False
+        j = link.find("/", i + 3)
+        host = link[i + 3 : j if j != -1 else None]
+        # strip credentials and port, rare but legal
+        host = host.rsplit("@", 1)[-1].split(":", 1)[0].lower()
         base = domain.lower().lstrip(".")
         return host == base or host.endswith("." + base)
     except Exception:
         return False
 
-def path_allowed(url: str, allowed_prefixes: list[str]) -> bool:
+def path_allowed(url: str, allowed_prefixes) -> bool:
     """Allow if list empty OR path begins with any prefix (prefixes must start with '/')."""
-    if not allowed_prefixes:
+    rx = _allowed_prefix_re(tuple(allowed_prefixes))
+    if rx is None:
         return True
     try:
-        p = urlparse(url).path or "/"
-        return any(p.startswith(pref) for pref in allowed_prefixes)
+        p = _uparse(url).path or "/"
     except Exception:
         return False
+    return bool(rx.match(p))
+
+def iter_sitemap_urls(domain: str, _url: str | None = None, _depth: int = 0):
+    """Yield page URLs from the domain's sitemap(s) as they are parsed.
 
-def seed_urls_from_sitemap(domain: str, allowed_prefixes: list[str]) -> set[str]:
-    """Seed with homepage and sitemap URLs filtered by ALLOWED_PATH_PREFIXES."""
-    seeds = {f"https://{START_PATH}/"}  # always include startpage
+    Streams the XML with iterparse over ``<loc>`` elements instead of
+    materializing the whole sitemap tree the way usp does — on 100k-URL
+    sitemaps the full tree dominates startup time and memory. Falls back to
+    the usp walk when lxml is unavailable.
+    """
+    if etree is None:
+        try:
+            tree = sitemap_tree_for_homepage(f"https://{domain}/")
+            for p in tree.all_pages():
+                yield p.url
+        except Exception as e:
+            dbg(f"[sitemap] could not fetch/parse sitemap for {domain}: {e}")
+        return
+    if _depth > 2:  # sitemap indexes of indexes; don't recurse forever
+        return
+    url = _url or f"https://{domain}/sitemap.xml"
     try:
-        tree = sitemap_tree_for_homepage(f"https://{domain}/")
-        for p in tree.all_pages():
-            u = p.url
-            if same_domain(u, domain) and path_allowed(u, allowed_prefixes):
-                seeds.add(u)
+        res = requests.get(url, timeout=15, stream=True)
+        res.raise_for_status()
+        res.raw.decode_content = True
+        for _, el in etree.iterparse(res.raw, tag="{*}loc"):
+            loc = (el.text or "").strip()
+            parent = el.getparent()
+            nested = parent is not None and etree.QName(parent).localname == "sitemap"
+            el.clear()
+            if not loc:
+                continue
+            if nested:  # sitemap index entry -> recurse into the child sitemap
+                yield from iter_sitemap_urls(domain, _url=loc, _depth=_depth + 1)
+            else:
+                yield loc
     except Exception as e:
-        dbg(f"[sitemap] could not fetch/parse sitemap for {domain}: {e}")
-    return seeds
+        dbg(f"[sitemap] could not stream sitemap {url}: {e}")
 
 async def extract_meta_and_markdown(page):
     html = await page.content()
-    h = html2text.HTML2Text()
-    h.ignore_links = False
-    h.ignore_images = False
-    markdown = h.handle(html)
-
-    meta = await page.evaluate(
-        """
-        () => {
-          const pick = (sel) => {
-            const el = document.querySelector(sel);
-            return el ? (el.getAttribute('content') ?? el.textContent ?? '').trim() : '';
-          };
-          // prefer canonical if present
-          const canon = document.querySelector('link[rel="canonical"]')?.href || '';
-          return {
-            ogTitle: pick('meta[property="og:title"]') || pick('meta[name="og:title"]'),
-            ogType:  pick('meta[property="og:type"]')  || pick('meta[name="og:type"]'),
-            titleTag: (document.title || '').trim(),
-            canonical: canon
-          };
-        }
-        """
-    )
-    return markdown, meta
+    markdown = await asyncio.get_running_loop().run_in_executor(CONVERTER_POOL, html_to_markdown, html)
 
-async def collect_static_links(page, domain: str) -> set[str]:
-    links = await safe_call(page, lambda: page.eval_on_selector_all("a[href]", "els => els.map(e => e.href)"))
-    static_links = {u for u in links if isinstance(u, str) and u.startswith("http") and same_domain(u, domain)}
-    out = set()
-    for lnk in static_links or []:
-        if isinstance(lnk, str) and lnk.startswith("http") and same_domain(lnk, domain):
-            out.add(lnk)
-    return out
-
-async def collect_inline_click_urls(page) -> set[str]:
-    inline_candidates = await safe_call(page, lambda: page.evaluate("""
-    () => {
-        const abs = (u) => { try { return new URL(u, location.href).href } catch { return '' } };
-        const found = new Set();
-        document.querySelectorAll('[data-href],[data-url]').forEach(el => {
-        const u = el.getAttribute('data-href') || el.getAttribute('data-url');
-        if (u) found.add(abs(u));
-        });
-        document.querySelectorAll('[onclick]').forEach(el => {
-        const s = el.getAttribute('onclick') || '';
-        const re = /(https?:\\/\\/[^'"\\s)]+|\\/[A-Za-z0-9_\\-\\/\\.?=&%#]+)/g;
-        let m; while ((m = re.exec(s)) !== null) { const u = abs(m[1]); if (u) found.add(u); }
-        });
-        document.querySelectorAll('[role="link"],[role="button"]').forEach(el => {
-        const u = el.getAttribute('href') || el.getAttribute('data-href') || el.getAttribute('data-url');
-        if (u) found.add(abs(u));
-        });
-        return Array.from(found);
-    }
-    """))
-    inline_click_urls = {u for u in inline_candidates if u}
-    return inline_click_urls
+    meta = await page.evaluate("window.__extractMeta ? window.__extractMeta() : {}")
+    return markdown, meta
 
 # async def drain_programmatic_nav(page) -> list[dict]:
 #     """
@@ -288,37 +459,54 @@ async def collect_inline_click_urls(page) -> set[str]:
 #     return discovered
 
 # ---------- core page handler ----------
-async def scrape_one_page(context, url: str, domain: str, allowed_prefixes: list[str], results_lock: asyncio.Lock):
-    page = await context.new_page()
+async def scrape_one_page(page, url: str, domain: str, allowed_prefixes: list[str], out_fh):
+    """Scrape one URL on a pooled page (caller owns the page lifecycle)."""
     try:
-        await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-        # let SPAs settle (they often pushState/redirect after DOMContentLoaded)
-        await wait_until_stable(page)
-
-        final_url = page.url
-
-        # ---- gather content/meta (with retry)
-        html = await safe_call(page, page.content)
-        h = html2text.HTML2Text()
-        h.ignore_links = False
-        h.ignore_images = False
-        markdown = h.handle(html)
-
-        meta = await safe_call(page, lambda: page.evaluate("""
-            () => {
-            const pick = (sel) => {
-                const el = document.querySelector(sel);
-                return el ? (el.getAttribute('content') ?? el.textContent ?? '').trim() : '';
-            };
-            const canon = document.querySelector('link[rel="canonical"]')?.href || '';
-            return {
-                ogTitle: pick('meta[property="og:title"]') || pick('meta[name="og:title"]'),
-                ogType:  pick('meta[property="og:type"]')  || pick('meta[name="og:type"]'),
-                titleTag: (document.title || '').trim(),
-                canonical: canon
-            };
-            }
-        """))
+        # the origin-facing portion (navigation + page reads) runs under the
+        # per-host semaphore; CPU work below stays outside it
+        async with sem_for(urlparse(url).netloc):
+            # commit-first navigation: don't block on slow loads, the initial
+            # HTML usually carries the link skeleton we need
+            try:
+                await page.goto(url, wait_until="commit", timeout=3000)
+            except PWTimeout:
+                pass  # partial page — extraction below still works
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=3000)
+            except PWTimeout:
+                pass
+            # let SPAs settle (pushState/redirect after DOMContentLoaded)
+            await wait_until_stable(page)
+
+            final_url = page.url
+
+            # anchors may render just after DCL; give them a beat
+            try:
+                await page.wait_for_selector("a", timeout=2000)
+            except PWTimeout:
+                pass
+
+            # ---- one fused evaluate: html + meta + static/inline links
+            # (four CDP round-trips collapsed into one)
+            snap = await safe_call(
+                page,
+                lambda: page.evaluate(PAGE_SNAPSHOT_JS, domain.lower().lstrip(".")),
+            )
+
+        html = snap["html"] or ""
+        # hashing is C-backed and ~free next to the conversion it can skip
+        content_key = hashlib.blake2b(html.encode("utf-8", "ignore"), digest_size=16).digest()
+        duplicate_content = content_key in SEEN_CONTENT_HASHES
+        if duplicate_content:
+            markdown = ""
+        else:
+            SEEN_CONTENT_HASHES.add(content_key)
+            # convert on another core; overlaps with the next page's fetch
+            markdown = await asyncio.get_running_loop().run_in_executor(
+                CONVERTER_POOL, html_to_markdown, html
+            )
+
+        meta = snap["meta"] or {}
 
         parsed = urlparse(final_url)
         first_seg = (parsed.path.split("/")[1] if parsed.path and parsed.path != "/" else "") or "website"
@@ -327,33 +515,44 @@ async def scrape_one_page(context, url: str, domain: str, allowed_prefixes: list
         canonical = meta.get("canonical") or final_url
 
         # ---- store ONLY if path matches allowed prefixes
-        if path_allowed(final_url, allowed_prefixes):
-            async with results_lock:
-                result = {
-                        "title": title,
-                        "type": page_type,
-                        "content": markdown,
-                        "url": canonical,
-                    }
-                if result not in RESULTS:
-                    RESULTS.append(result)
+        if path_allowed(final_url, allowed_prefixes) and not duplicate_content \
+                and canonical not in WRITTEN_URLS:
+            WRITTEN_URLS.add(canonical)
+            # stream one JSONL record per page: nothing accumulates in RAM
+            # and the record hits the (buffered) file as soon as it exists
+            result = {
+                    "title": title,
+                    "type": page_type,
+                    "content": markdown,
+                    "url": canonical,
+                }
+            out_fh.write(_json_bytes(result) + b"\n")
 
         if VERBOSE:
             dbg(f"[saved] {final_url}  (title='{title[:80]}', type='{page_type}')")
 
-        # ---- discover links
-        static_links = await collect_static_links(page, domain)
-        inline_click_urls = await collect_inline_click_urls(page)
+        # ---- discover links; the snapshot HTML reflects the settled DOM,
+        # so the in-process lxml walk sees JS-injected anchors too
+        if lxml_html is not None:
+            try:
+                static_links = await asyncio.to_thread(_anchors_from_html, html, final_url, domain)
+            except Exception:
+                static_links = set(snap["staticLinks"] or [])
+        else:
+            static_links = set(snap["staticLinks"] or [])
+        inline_click_urls = {u for u in (snap["inlineClickUrls"] or []) if u}
         hidden_links = set()
-        if not QUICK_MODE:
-            hidden_links = await get_all_links(
-                url=url,
-                max_clicks=120,
-                click_wait_ms=200,
-                same_domain_only=True,
-                headless=True,
-                scroll_steps=12
-            )
+        if not QUICK_MODE and len(static_links | inline_click_urls) < HIDDEN_MIN_LINKS:
+            async with HIDDEN_PROBE_SEM:
+                hidden_links = set(await get_all_links(
+                    url=url,
+                    max_clicks=120,
+                    click_wait_ms=200,
+                    same_domain_only=True,
+                    headless=True,
+                    scroll_steps=12,
+                    context=page.context,  # reuse our browser, don't launch one
+                ))
 
         # click_only_urls = await probe_click_only_links(
         #     page, domain=domain, max_clicks=MAX_CLICK_PROBES_PER_PAGE, wait_ms=CLICK_WAIT_MS
@@ -376,86 +575,163 @@ async def scrape_one_page(context, url: str, domain: str, allowed_prefixes: list
     except Exception as e:
         dbg(f"[error] {url} -> {e}")
         return url, set()
-    finally:
-        await page.close()
 
 # ---------- worker pool using a Queue ----------
-async def crawl_domain(domain: str, limit: int = 50, concurrency: int = 5, allowed_prefixes: list[str] | None = None):
+async def crawl_domain(domain: str, limit: int = 50, concurrency: int = 5, allowed_prefixes: list[str] | None = None,
+                       shard: int = 0, shards: int = 1, out_path: str | None = None):
     """
     Parallel crawler:
       - installs nav hooks (before any page script)
       - seeds from sitemap + homepage (homepage always included to discover deeper links)
       - visits/enqueues ONLY URLs that match allowed_prefixes (unless prefixes empty)
       - respects a page 'limit'
-      - stores each matching page result in the global RESULTS
+      - streams each matching page result to the JSONL output
       - detects click-only navs (onclick / pushState / JS listeners) and enqueues them too
     """
     allowed_prefixes = allowed_prefixes or []
 
-    # seeds (homepage + sitemap-filtered)
-    seeds = seed_urls_from_sitemap(domain, allowed_prefixes)
-    seeds.add(f"https://{domain}/")  # ensure homepage
-
     queue: asyncio.Queue[str] = asyncio.Queue()
-    enqueued = set()
-    visited = set()
-    results_lock = asyncio.Lock()
-    visited_lock = asyncio.Lock()
+    enqueued = SeenUrls()
+    visited = SeenUrls()
+    visited_count = 0  # exact page count for the limit (len(bloom) is fuzzy)
+
+    # homepage seeds go in immediately; sitemap URLs stream in behind them
+    for u in {f"https://{START_PATH}/", f"https://{domain}/"}:
+        queue.put_nowait(u)
+        enqueued.add(canonical_url(u))
+
+    def in_shard(u: str) -> bool:
+        return shards <= 1 or _shard_of(canonical_url(u), shards) == shard
+
+    def enqueue_seed(u: str):
+        # runs on the event loop (via call_soon_threadsafe), so plain set ops
+        cu = canonical_url(u)
+        if cu in enqueued or not in_shard(u) or not same_domain(u, domain) or not path_allowed(u, allowed_prefixes):
+            return
+        enqueued.add(cu)
+        queue.put_nowait(u)
+
+    async def stream_sitemap_seeds():
+        loop = asyncio.get_running_loop()
+
+        def walk():
+            for u in iter_sitemap_urls(domain):
+                loop.call_soon_threadsafe(enqueue_seed, u)
 
-    # enqueue seeds (respect allowed prefixes *except* homepage)
-    for u in seeds:
-        if same_domain(u, domain) and (path_allowed(u, allowed_prefixes) or urlparse(u).path in ("", "/")):
-            queue.put_nowait(u)
-            enqueued.add(u)
+        await asyncio.to_thread(walk)
+
+    # workers start on the homepage while the sitemap is still downloading
+    sitemap_task = asyncio.create_task(stream_sitemap_seeds())
+
+    out_fh = open(out_path or OUTPUT_JSONL, "wb", buffering=1 << 20)
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=HEADLESS)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (compatible; OpenAII/1.0; +https://example.com/bot)"
-        )
-        # Install nav hooks for all pages BEFORE any page script runs
-        await context.add_init_script(NAV_INJECT_JS)
+
+        # Text and links are all we extract; don't download pixels for them
+        async def _route(route):
+            if route.request.resource_type in BLOCK_RESOURCE_TYPES:
+                await route.abort()
+            else:
+                await route.continue_()
+
+        # Each BrowserContext gets its own CDP session, so sharding pages
+        # over a few contexts keeps high worker counts from serializing on
+        # one driver WebSocket. ~5 pages per context is plenty.
+        n_contexts = max(1, concurrency // 5)
+        pages_per_ctx = -(-concurrency // n_contexts)  # ceil division
+
+        # context -> {"pages": pooled pages on it, "served": URLs handled,
+        #             "retired": past the rotation threshold}
+        ctx_state: dict = {}
+
+        async def new_crawl_context():
+            ctx = await browser.new_context(
+                user_agent="Mozilla/5.0 (compatible; OpenAII/1.0; +https://example.com/bot)"
+            )
+            await ctx.route("**/*", _route)
+            # Install nav hooks for all pages BEFORE any page script runs
+            await ctx.add_init_script(NAV_INJECT_JS)
+            ctx_state[ctx] = {"pages": 0, "served": 0, "retired": False}
+            return ctx
+
+        async def recycle_page(page):
+            """Close a page of a retired context (closing the context itself
+            once its last page is gone) and return a fresh replacement."""
+            ctx = page.context
+            await page.close()
+            st = ctx_state[ctx]
+            st["pages"] -= 1
+            if st["pages"] == 0:
+                await ctx.close()
+                del ctx_state[ctx]
+            for ctx2, st2 in ctx_state.items():
+                if not st2["retired"] and st2["pages"] < pages_per_ctx:
+                    break
+            else:
+                ctx2 = await new_crawl_context()
+                st2 = ctx_state[ctx2]
+            st2["pages"] += 1
+            return await ctx2.new_page()
+
+        # Pre-create one page per worker and reuse them: new_page()/close() is
+        # one of the heaviest Playwright round-trips, and goto() resets state.
+        ctxs = [await new_crawl_context() for _ in range(n_contexts)]
+        page_pool: asyncio.Queue = asyncio.Queue()
+        for i in range(concurrency):
+            ctx = ctxs[i % n_contexts]
+            ctx_state[ctx]["pages"] += 1
+            page_pool.put_nowait(await ctx.new_page())
 
         async def worker(worker_id: int):
+            nonlocal visited_count
             while True:
-                try:
-                    url = await asyncio.wait_for(queue.get(), timeout=3.0)
-                except asyncio.TimeoutError:
-                    if queue.empty():
-                        return
+                url = await queue.get()
+                if url is None:  # shutdown sentinel
+                    queue.task_done()
+                    return
+
+                # limit/visited gate — plain ops are safe: asyncio is
+                # single-threaded and there is no await between check and add.
+                # Past the limit we keep draining so queue.join() can finish.
+                if visited_count >= limit or canonical_url(url) in visited:
+                    queue.task_done()
                     continue
-
-                # limit/visited gate
-                async with visited_lock:
-                    if len(visited) >= limit:
-                        queue.task_done()
-                        return
-                    if url in visited:
-                        queue.task_done()
-                        continue
-                    visited.add(url)
+                visited.add(canonical_url(url))
+                visited_count += 1
 
                 if VERBOSE:
                     dbg(f"[worker {worker_id}] visiting: {url}")
 
-                final_url, links = await scrape_one_page(context, url, domain, allowed_prefixes, results_lock)
-
-                # >>> REPLACE your per-link lock loop with the batched version here <<<
-                to_add = []
-                async with visited_lock:
-                    if len(visited) < limit:
-                        for lnk in links:
-                            if len(visited) >= limit:
-                                break
-                            if lnk not in visited and lnk not in enqueued and path_allowed(lnk, allowed_prefixes):
-                                enqueued.add(lnk)
-                                to_add.append(lnk)
-
-                for lnk in to_add:
-                    queue.put_nowait(lnk)
-
-                if VERBOSE and to_add:
-                    dbg(f"[worker {worker_id}] enqueued {len(to_add)} new links from {final_url}")
+                page = await page_pool.get()
+                try:
+                    final_url, links = await scrape_one_page(page, url, domain, allowed_prefixes, out_fh)
+                finally:
+                    st = ctx_state.get(page.context)
+                    if st is not None:
+                        st["served"] += 1
+                        if st["served"] >= CONTEXT_ROTATE_PAGES:
+                            st["retired"] = True
+                        if st["retired"]:
+                            page = await recycle_page(page)
+                    page_pool.put_nowait(page)
+
+                # links are already same-domain + path-filtered; membership
+                # checks run against canonical forms
+                added = 0
+                if visited_count < limit:
+                    for lnk in links:
+                        if not in_shard(lnk):
+                            continue
+                        cu = canonical_url(lnk)
+                        if cu in enqueued or cu in visited:
+                            continue
+                        enqueued.add(cu)
+                        queue.put_nowait(lnk)
+                        added += 1
+
+                if VERBOSE and added:
+                    dbg(f"[worker {worker_id}] enqueued {added} new links from {final_url}")
 
                 queue.task_done()
 
@@ -463,41 +739,85 @@ async def crawl_domain(domain: str, limit: int = 50, concurrency: int = 5, allow
 
         workers = [asyncio.create_task(worker(i)) for i in range(concurrency)]
 
+        await sitemap_task  # all seeds enqueued (workers crawl meanwhile)
         await queue.join()
-        for w in workers:
-            w.cancel()
-        await asyncio.gather(*workers, return_exceptions=True)
-
-        await context.close()
+        # wake each worker exactly once; no 3s idle timeout at crawl end
+        for _ in workers:
+            queue.put_nowait(None)
+        await asyncio.gather(*workers)
+
+        while not page_pool.empty():
+            await page_pool.get_nowait().close()
+        for ctx in list(ctx_state):
+            await ctx.close()
         await browser.close()
 
-    print(f"✅ visited {len(visited)} pages for {domain}")
+    out_fh.close()
+    print(f"✅ visited {visited_count} pages for {domain}")
 
 # ---------- entry point ----------
-if __name__ == "__main__":
+def _run_shard(shard: int):
+    """One crawler process: its own event loop, browser, and JSONL output."""
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(
         crawl_domain(
             DOMAIN,
             limit=LIMIT,
             concurrency=CONCURRENCY,
             allowed_prefixes=ALLOWED_PATH_PREFIXES,
+            shard=shard,
+            shards=SHARDS,
+            out_path=f"crawl_output.shard{shard}.jsonl",
         )
     )
 
+
+if __name__ == "__main__":
+    if SHARDS > 1:
+        procs = [multiprocessing.Process(target=_run_shard, args=(i,)) for i in range(SHARDS)]
+        for pr in procs:
+            pr.start()
+        for pr in procs:
+            pr.join()
+        shard_files = [f"crawl_output.shard{i}.jsonl" for i in range(SHARDS)]
+    else:
+        if uvloop is not None:
+            uvloop.install()
+        asyncio.run(
+            crawl_domain(
+                DOMAIN,
+                limit=LIMIT,
+                concurrency=CONCURRENCY,
+                allowed_prefixes=ALLOWED_PATH_PREFIXES,
+            )
+        )
+        shard_files = [OUTPUT_JSONL]
+
+    # One streaming pass over the JSONL written during the crawl (per-shard
+    # files when sharded): dedupe by URL and materialize the combined JSON
+    # array without ever holding all records in memory.
     seen = set()
-    unique = []
-    for item in RESULTS:
-        # Prefer source_url, fallback to url, else skip
-        key = item.get("source_url") or item.get("url")
-        if not key:   # if neither present, skip this item
-            continue
-        if key not in seen:
-            seen.add(key)
-            unique.append(item)
-
-    RESULTS = unique
-
-    # Save JSON
-    with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(RESULTS, f, ensure_ascii=False, indent=2)
-    print(f"\nSaved {len(RESULTS)} records to {OUTPUT_JSON}")
+    count = 0
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(OUTPUT_JSON, "wb") as f:
+        f.write(b"[")
+        for shard_file in shard_files:
+            try:
+                src = open(shard_file, "rb")
+            except FileNotFoundError:
+                continue
+            with src:
+                for line in src:
+                    item = loads(line)
+                    # Prefer source_url, fallback to url, else skip
+                    key = item.get("source_url") or item.get("url")
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    if count:
+                        f.write(b",")
+                    f.write(_json_bytes(item))
+                    count += 1
+        f.write(b"]")
+    print(f"\nSaved {count} records to {OUTPUT_JSON}")
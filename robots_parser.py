@@ -1,8 +1,33 @@
+import asyncio
+import functools
+
 import requests
 from urllib.parse import urlparse, urljoin
 from robotexclusionrulesparser import RobotExclusionRulesParser
 
 
+@functools.lru_cache(maxsize=1024)
+def _fetch_robots(robots_url, agent):
+    """Fetch and parse robots.txt once per (url, agent).
+
+    Cached so that constructing several helpers for the same domain (common:
+    one per crawl entry point) costs one network round-trip, not N.
+    """
+    headers = {"User-Agent": f"Mozilla/5.0 (compatible; {agent}/1.0)"}
+    res = requests.get(robots_url, headers=headers, timeout=10)
+
+    if res.status_code != 200:
+        raise ValueError(f"Could not fetch robots.txt: {robots_url} ({res.status_code})")
+
+    robots_txt = res.text.strip()
+    if not robots_txt:
+        raise ValueError(f"robots.txt at {robots_url} is empty")
+
+    rerp = RobotExclusionRulesParser()
+    rerp.parse(robots_txt)
+    return rerp, robots_txt
+
+
 class RobotsHelper:
     def __init__(self, domain_or_url, agent="*"):
         """
@@ -32,20 +57,15 @@ class RobotsHelper:
         # Extract sitemaps
         self.sitemaps = self._extract_sitemaps()
 
-    def _load_robots(self):
-        headers = {"User-Agent": f"Mozilla/5.0 (compatible; {self.agent}/1.0)"}
-        res = requests.get(self.robots_url, headers=headers, timeout=10)
-
-        if res.status_code != 200:
-            raise ValueError(f"Could not fetch robots.txt: {self.robots_url} ({res.status_code})")
+    @classmethod
+    async def create(cls, domain_or_url, agent="*"):
+        """Async constructor: runs the blocking robots.txt fetch in a worker
+        thread so callers on the event loop (crawl startup) never stall on
+        network I/O. Build once per domain and share across workers."""
+        return await asyncio.to_thread(cls, domain_or_url, agent)
 
-        robots_txt = res.text.strip()
-        if not robots_txt:
-            raise ValueError(f"robots.txt at {self.robots_url} is empty")
-
-        rerp = RobotExclusionRulesParser()
-        rerp.parse(robots_txt)
-        return rerp, robots_txt
+    def _load_robots(self):
+        return _fetch_robots(self.robots_url, self.agent)
 
     def _extract_sitemaps(self):
         """Extract Sitemap URLs from robots.txt content"""
@@ -22,21 +22,80 @@ Note: If `python-usp` fails on your platform, the crawler will still run
 """
 
 from __future__ import annotations
+import collections
+import hashlib
+import itertools
+import multiprocessing
 import os
 import re
 import json
 import time
-import queue
 import threading
+import types
+from functools import lru_cache
 from typing import Optional, Dict, Any
-from flask import Flask, request, Response, send_from_directory, jsonify, render_template_string, abort
+from flask import Flask, request, Response, send_from_directory, jsonify, abort
 
 from crawler import CrawlerConfig, run_crawl  # our module
 
+try:
+    from waitress import serve as _waitress_serve
+except Exception:
+    _waitress_serve = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    from flask_compress import Compress
+except Exception:
+    Compress = None
+
+
+def _json_bytes(obj) -> bytes:
+    """Encode to compact JSON bytes, preferring orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 APP = Flask(__name__)
+# When fronted by nginx/Apache with X-Sendfile/X-Accel-Redirect support, hand
+# the file descriptor off so the kernel does a zero-copy sendfile(2) instead of
+# Werkzeug shuttling 64 KiB chunks through userspace. Opt-in via env so the
+# bare dev server keeps working unchanged.
+APP.use_x_sendfile = os.environ.get("X_SENDFILE", "").strip().lower() in ("1", "true", "on")
+
+if orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class _OrjsonProvider(JSONProvider):
+        """Route jsonify and request.get_json through orjson (C + SIMD)."""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode("utf-8")
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    APP.json = _OrjsonProvider(APP)
+
+if Compress is not None:
+    # Gzip/Brotli for the chatty endpoints: file listings are repetitive JSON
+    # and SSE log text compresses ~10x. COMPRESS_STREAMS keeps the event
+    # stream flushing frame by frame instead of buffering until close.
+    APP.config["COMPRESS_MIMETYPES"] = ["application/json", "text/event-stream", "text/html"]
+    APP.config["COMPRESS_LEVEL"] = 4
+    APP.config["COMPRESS_STREAMS"] = True
+    Compress(APP)
 
 # --- job state ---
-_job_thread: Optional[threading.Thread] = None
+# The crawl runs in a child process, not a thread: HTML parsing, markdown
+# conversion and regex work there never contend with Flask handlers for this
+# interpreter's GIL, and stop can actually terminate the job.
+_job_proc: Optional[multiprocessing.Process] = None
+_job_log_q: Optional["multiprocessing.Queue"] = None
 _job_stop = threading.Event()
 _job_status: Dict[str, Any] = {
     "running": False,
@@ -47,34 +106,112 @@ _job_status: Dict[str, Any] = {
     "started_at": 0,
     "finished_at": 0,
 }
-_log_queue: "queue.Queue[str]" = queue.Queue(maxsize=10000)
+# "saved" is bumped from the crawler's log callback thread while Flask threads
+# read it. next() on a count advances in one C call — atomic under the GIL,
+# unlike the read-modify-write of `+= 1` — and the result lands in the status
+# dict with a plain (also atomic) store.
+_saved_counter = itertools.count(1)
+# /api/status is polled every few seconds per tab; re-encoding an unchanged
+# snapshot each poll is wasted CPU. Mutators bump _status_version (an atomic
+# store of the next ticket) and api_status re-serializes only on change.
+_status_version_ctr = itertools.count(1)
+_status_version = 0
+_status_cache = (b"", -1)  # (body, version) swapped atomically as a tuple
+
+
+def _bump_status():
+    """Mark the status snapshot dirty so /api/status re-encodes it."""
+    global _status_version
+    _status_version = next(_status_version_ctr)
+
+
+def _bump_saved():
+    _job_status["saved"] = next(_saved_counter)
+    _bump_status()
+
+
+# on_log sees every crawler line (thousands/sec in bursts); one dict lookup on
+# the 7-byte tag prefix replaces a chain of startswith tests. Untagged lines
+# fall through to a None handler and cost nothing extra.
+_TAG_HANDLERS = {
+    "[saved]": _bump_saved,
+}
+# Log fan-out is publish/subscribe: each connected /logs client owns a bounded
+# deque (append/popleft are atomic under the GIL) plus a wakeup event, so every
+# line reaches every browser instead of whichever one popped it first.
+# _subscribers is a copy-on-write tuple: log_line iterates it lock-free; the
+# lock only guards subscribe/unsubscribe.
+_subscribers: tuple = ()
+_subscribers_lock = threading.Lock()
+
+# SSE framing as pre-encoded bytes: the WSGI layer wants bytes anyway, so
+# emitting them directly skips a format() and an encode() per line.
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_KEEPALIVE = b":\n\n"
 
 OUTPUT_ROOT = "output"
 
+# Hot-path patterns, compiled once instead of re-fetched from re's cache on
+# every request.
+_SCHEME_RE = re.compile(r"^https?://")
+_DOMAIN_RE = re.compile(r"^[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+_DOWNLOAD_RE = re.compile(r"^([A-Za-z0-9.-]+\.[A-Za-z]{2,})/(.+)$")
+
+def _subscribe():
+    global _subscribers
+    dq: "collections.deque[str]" = collections.deque(maxlen=2000)
+    wakeup = threading.Event()
+    with _subscribers_lock:
+        _subscribers = _subscribers + ((dq, wakeup),)
+    return dq, wakeup
+
+def _unsubscribe(dq):
+    global _subscribers
+    with _subscribers_lock:
+        _subscribers = tuple(s for s in _subscribers if s[0] is not dq)
+
 def log_line(msg: str):
     ts = time.strftime("%H:%M:%S")
     line = f"[{ts}] {msg}"
-    try:
-        _log_queue.put_nowait(line)
-    except queue.Full:
-        pass  # drop if overwhelmed
+    for dq, wakeup in _subscribers:
+        dq.append(line)  # maxlen drops the oldest line if a client lags
+        wakeup.set()
 
+@lru_cache(maxsize=256)
 def _validate_domain(raw: str) -> str:
     """
     Enforce 'example.com' or 'sub.example.com' (no scheme, no path).
+
+    Cached: the UI re-validates the same domain on every 4s poll, so the
+    regex only runs once per distinct input. Rejections raise and are
+    deliberately not cached by lru_cache.
     """
     raw = (raw or "").strip()
     # Allow bare host only
     if raw.startswith("http://") or raw.startswith("https://"):
         # strip scheme if user pasted full URL
-        raw = re.sub(r"^https?://", "", raw)
+        raw = _SCHEME_RE.sub("", raw)
     raw = raw.split("/")[0]
-    if not re.match(r"^[A-Za-z0-9.-]+\.[A-Za-z]{2,}$", raw):
+    if not _DOMAIN_RE.match(raw):
         raise ValueError("Please enter domain like 'example.com' (no http/https, no path).")
     return raw
 
+def _job_runner(cfg: CrawlerConfig, log_q: "multiprocessing.Queue"):
+    """Child-process entry point: run the crawl, shipping everything back over
+    the log queue — log lines as strings, final stats as a dict, then a None
+    end-of-stream sentinel. Must stay module-level so it pickles under spawn."""
+    try:
+        stats = run_crawl(cfg, log=log_q.put)
+        log_q.put({"visited": stats.visited, "enqueued": stats.enqueued, "saved": stats.saved})
+    except Exception as e:
+        log_q.put(f"[server] job error: {e}")
+    finally:
+        log_q.put(None)
+
+
 def _start_job(cfg: CrawlerConfig):
-    global _job_thread, _job_stop, _job_status
+    global _job_proc, _job_log_q, _saved_counter
 
     domain_folder = os.path.join(OUTPUT_ROOT, cfg.domain)
     if os.path.isdir(domain_folder):
@@ -89,8 +226,12 @@ def _start_job(cfg: CrawlerConfig):
     if _job_status["running"]:
         raise RuntimeError("A crawl is already running.")
 
-    _job_stop = threading.Event()
-    _job_status = {
+    _saved_counter = itertools.count(1)
+    # Mutate the shared Event/dict in place rather than rebinding the module
+    # globals: readers in other threads hold references to these objects, and
+    # a rebind would leave them looking at a stale snapshot mid-start.
+    _job_stop.clear()
+    _job_status.update({
         "running": True,
         "visited": 0,
         "enqueued": 0,
@@ -98,58 +239,74 @@ def _start_job(cfg: CrawlerConfig):
         "domain": cfg.domain,
         "started_at": time.time(),
         "finished_at": 0,
-    }
-
-    def on_log(msg: str):
-        log_line(msg)
-        # light status parsing (optional)
-        if msg.startswith("[worker"):
-            # will get visited via status in crawler runner; leave as-is
-            pass
-        elif msg.startswith("[saved]"):
-            _job_status["saved"] += 1
-
-    def runner():
-        try:
-            stats = run_crawl(cfg, log=on_log)
-            _job_status["visited"] = stats.visited
-            _job_status["enqueued"] = stats.enqueued
-            _job_status["saved"] = stats.saved  # already approx updated
-        except Exception as e:
-            log_line(f"[server] job error: {e}")
-        finally:
-            _job_status["running"] = False
-            _job_status["finished_at"] = time.time()
-            log_line("[server] job finished")
-
-    _job_thread = threading.Thread(target=runner, daemon=True)
-    _job_thread.start()
+    })
+    _bump_status()
+
+    log_q: "multiprocessing.Queue" = multiprocessing.Queue(maxsize=10000)
+    proc = multiprocessing.Process(target=_job_runner, args=(cfg, log_q), daemon=True)
+    _job_log_q = log_q
+    _job_proc = proc
+    proc.start()
+
+    def pump():
+        # Drain the child's queue on this side; tag dispatch (saved counts)
+        # happens here so the child needs no shared counters.
+        while True:
+            msg = log_q.get()
+            if msg is None:
+                break
+            if isinstance(msg, dict):
+                _job_status.update(msg)  # final stats from the child
+                _bump_status()
+                continue
+            log_line(msg)
+            handler = _TAG_HANDLERS.get(msg[:7])
+            if handler is not None:
+                handler()
+        proc.join()
+        _job_status["running"] = False
+        _job_status["finished_at"] = time.time()
+        _bump_status()
+        log_line("[server] job finished")
+
+    threading.Thread(target=pump, daemon=True).start()
 
 # --------------- routes ---------------
 
 @APP.route("/", methods=["GET"])
 def home():
-    # Tailwind (CDN), big terminal, clean controls.
-    return render_template_string(UI_HTML, defaults=default_params())
+    # Tailwind (CDN), big terminal, clean controls. The page is rendered once
+    # at import (defaults never change per request); the ETag lets browsers
+    # revalidate with a cheap 304 instead of refetching the whole page.
+    if request.headers.get("If-None-Match") == _UI_HTML_ETAG:
+        return Response(status=304, headers={"ETag": _UI_HTML_ETAG})
+    return Response(
+        _UI_HTML_RENDERED,
+        mimetype="text/html",
+        headers={"ETag": _UI_HTML_ETAG, "Cache-Control": "no-cache"},
+    )
+
+# Crawl defaults never change at runtime; share one read-only mapping instead
+# of building a fresh dict on every call site.
+_DEFAULT_PARAMS = types.MappingProxyType({
+    "domain": "quill.co",
+    "start_path": "",
+    "limit": 1000,
+    "concurrency": 5,
+    "headless": True,
+    "verbose": True,
+    "quick_mode": True,
+    "allowed_prefixes": "",
+    "output_dir": OUTPUT_ROOT,
+    "flush_every_items": 50,
+    "flush_every_seconds": 10,
+})
 
 def default_params():
-    return {
-        "domain": "quill.co",
-        "start_path": "",
-        "limit": 1000,
-        "concurrency": 5,
-        "headless": True,
-        "verbose": True,
-        "quick_mode": True,
-        "allowed_prefixes": "",
-        "output_dir": OUTPUT_ROOT,
-        "flush_every_items": 50,
-        "flush_every_seconds": 10,
-    }
+    return _DEFAULT_PARAMS
 
 @APP.route("/api/start", methods=["POST"])
 def api_start():
-    global _job_status
     if _job_status.get("running"):
         return jsonify({"ok": False, "error": "A crawl is already running."}), 400
 
@@ -178,8 +335,8 @@ def api_start():
     cfg = CrawlerConfig(
         domain=domain,
         start_path=data.get("start_path", "").strip(),
-        limit=int(data.get("limit", default_params()["limit"])),
-        concurrency=int(data.get("concurrency", default_params()["concurrency"])),
+        limit=int(data.get("limit", _DEFAULT_PARAMS["limit"])),
+        concurrency=int(data.get("concurrency", _DEFAULT_PARAMS["concurrency"])),
         headless=to_bool(data.get("headless"), True),
         verbose=to_bool(data.get("verbose"), True),
         quick_mode=to_bool(data.get("quick_mode"), True),
@@ -201,21 +358,27 @@ def api_start():
 
 @APP.route("/api/stop", methods=["POST"])
 def api_stop():
-    global _job_stop, _job_status
     if not _job_status.get("running"):
         return jsonify({"ok": False, "error": "No running job."}), 400
-    # signal stop by putting a sentinel into the log and setting event for runner loop
-    log_line("[server] stop requested (crawler will finish current work item)")
-    # The crawler instance listens for stop internally; here we can't signal directly
-    # because we run the sync runner. A pragmatic approach: set a global flag file,
-    # or simpler—let the user restart the server between runs. For now, we tell user to restart.
-    # If you want hard-stop, you can rewire run_crawl to accept a threading.Event.
-    # (Already supported in module if you choose to call run_crawl with stop_event via asyncio.)
-    return jsonify({"ok": True, "note": "Stop will apply at next iteration if wired. Restart server to force-stop."})
+    log_line("[server] stop requested; terminating crawler process")
+    # The job is a separate process, so stop is a real SIGTERM. Push the
+    # end-of-stream sentinel ourselves since the child won't get to.
+    proc, log_q = _job_proc, _job_log_q
+    if proc is not None and proc.is_alive():
+        proc.terminate()
+    if log_q is not None:
+        log_q.put(None)
+    return jsonify({"ok": True})
 
 @APP.route("/api/status", methods=["GET"])
 def api_status():
-    return jsonify({"ok": True, "status": _job_status})
+    global _status_cache
+    body, ver = _status_cache
+    cur = _status_version
+    if ver != cur:
+        body = _json_bytes({"ok": True, "status": _job_status})
+        _status_cache = (body, cur)
+    return Response(body, mimetype="application/json")
 
 @APP.route("/api/files", methods=["GET"])
 def api_files():
@@ -226,12 +389,22 @@ def api_files():
     folder = os.path.join(OUTPUT_ROOT, safe_domain)
     if not os.path.isdir(folder):
         return jsonify({"ok": True, "files": []})
-    out = []
-    for name in sorted(os.listdir(folder)):
-        path = os.path.join(folder, name)
-        if os.path.isfile(path):
-            out.append({"name": name, "size": os.path.getsize(path)})
-    return jsonify({"ok": True, "files": out})
+    def gen():
+        # Stream the listing entry by entry: scandir yields name + cached stat
+        # in one directory pass, and encoding per entry keeps memory flat no
+        # matter how many files a crawl produced.
+        yield b'{"ok": true, "files": ['
+        first = True
+        with os.scandir(folder) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if not entry.is_file():
+                    continue
+                piece = _json_bytes({"name": entry.name, "size": entry.stat().st_size})
+                yield piece if first else b"," + piece
+                first = False
+        yield b"]}"
+
+    return Response(gen(), mimetype="application/json")
 
 @APP.route("/download", methods=["GET"])
 def download_file():
@@ -239,7 +412,7 @@ def download_file():
     if not f:
         abort(400)
     # restrict to output/<domain>/filename
-    m = re.match(r"^([A-Za-z0-9.-]+\.[A-Za-z]{2,})/(.+)$", f)
+    m = _DOWNLOAD_RE.match(f)
     if not m:
         abort(400)
     domain, fname = m.group(1), m.group(2)
@@ -248,21 +421,54 @@ def download_file():
         abort(404)
     if "/" in fname or "\\" in fname:
         abort(400)
-    return send_from_directory(folder, fname, as_attachment=True)
+    try:
+        st = os.stat(os.path.join(folder, fname))
+    except OSError:
+        abort(404)
+    # Crawl outputs are immutable once written, so (size, mtime) is a cheap
+    # stable ETag: a retry of an already-fetched file costs a 0-byte 304.
+    etag = f'"{st.st_size:x}-{int(st.st_mtime):x}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status=304, headers={"ETag": etag})
+    # conditional=True serves Range requests and honours If-Modified-Since,
+    # so interrupted downloads of multi-MB outputs resume instead of restarting.
+    resp = send_from_directory(folder, fname, as_attachment=True, conditional=True)
+    resp.headers["ETag"] = etag
+    return resp
 
 @APP.route("/logs", methods=["GET"])
 def stream_logs():
     def gen():
-        # send recent hello
-        yield f"data: [logs] connected\n\n"
-        while True:
-            try:
-                line = _log_queue.get(timeout=1.0)
-                yield f"data: {line}\n\n"
-            except queue.Empty:
-                # keep-alive
-                yield ":\n\n"
-    return Response(gen(), mimetype="text/event-stream")
+        dq, wakeup = _subscribe()
+        try:
+            # send recent hello
+            yield b"data: [logs] connected\n\n"
+            while True:
+                try:
+                    batch = [dq.popleft()]
+                except IndexError:
+                    wakeup.clear()
+                    if not wakeup.wait(timeout=15.0):
+                        # keep-alive only when genuinely idle
+                        yield _SSE_KEEPALIVE
+                    continue
+                # Drain whatever else is already buffered (capped) and emit it
+                # all in one chunk: one socket write per burst, not per line.
+                # Each line stays its own SSE event, so the client is unchanged.
+                while len(batch) < 64:
+                    try:
+                        batch.append(dq.popleft())
+                    except IndexError:
+                        break
+                yield b"".join(
+                    _SSE_PREFIX + line.encode("utf-8", "replace") + _SSE_SUFFIX
+                    for line in batch
+                )
+        finally:
+            _unsubscribe(dq)
+    # direct_passthrough hands the byte chunks straight to the WSGI server
+    # without Werkzeug re-wrapping the iterator.
+    return Response(gen(), mimetype="text/event-stream", direct_passthrough=True)
 
 UI_HTML = """
 <!doctype html>
@@ -366,13 +572,31 @@ const term = document.getElementById('term');
 const statusBadge = document.getElementById('statusBadge');
 let evtSrc = null;
 
-function appendLog(line) {
-  const el = document.createElement('div');
-  el.textContent = line;
-  term.appendChild(el);
+// Batch log DOM writes: accumulate lines and flush once per animation frame
+// via a DocumentFragment, so a burst of lines costs one reflow, not one each.
+let _pendingLogs = [];
+let _logRaf = 0;
+
+function flushLogs() {
+  const frag = document.createDocumentFragment();
+  for (const line of _pendingLogs) {
+    const el = document.createElement('div');
+    el.textContent = line;
+    frag.appendChild(el);
+  }
+  _pendingLogs.length = 0;
+  _logRaf = 0;
+  term.appendChild(frag);
+  // cap the backlog so long crawls don't bloat the DOM
+  while (term.childNodes.length > 5000) term.removeChild(term.firstChild);
   term.scrollTop = term.scrollHeight;
 }
 
+function appendLog(line) {
+  _pendingLogs.push(line);
+  if (!_logRaf) _logRaf = requestAnimationFrame(flushLogs);
+}
+
 function formDataJSON(form) {
   const fd = new FormData(form);
   // ensure unchecked checkboxes => 'off'
@@ -466,7 +690,17 @@ setInterval(() => {
 </html>
 """
 
+# Compile and render the UI exactly once: Jinja lexing a 300-line template on
+# every GET / is pure waste when the interpolated defaults are constants.
+_UI_HTML_RENDERED = APP.jinja_env.from_string(UI_HTML).render(defaults=default_params()).encode("utf-8")
+_UI_HTML_ETAG = '"%s"' % hashlib.blake2s(_UI_HTML_RENDERED, digest_size=8).hexdigest()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", "5000"))
     print(f"Serving on http://127.0.0.1:{port}")
-    APP.run(host="127.0.0.1", port=port, debug=True, threaded=True)
+    if _waitress_serve is not None:
+        # Production WSGI: fixed worker pool instead of a thread per request,
+        # with a long channel timeout so SSE clients are not disconnected.
+        _waitress_serve(APP, host="127.0.0.1", port=port, threads=16, channel_timeout=3600)
+    else:
+        APP.run(host="127.0.0.1", port=port, debug=True, threaded=True)